@@ -6,7 +6,10 @@ Dependency:
   pip install reportlab
 """
 
+import itertools
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from xml.sax.saxutils import escape
 
@@ -25,6 +28,14 @@ except Exception:
 
 # -------------------- Core PDF building helpers --------------------
 
+# Longest part of a message laid out as one paragraph: a paragraph is wrapped again every time
+# it's split across pages, so one giant message would take quadratic time
+CHUNK_CHARS = 3000
+# Flowables waiting to be laid out; the rest stay in the messages iterator until needed
+LOOKAHEAD = 64
+
+_styles = None
+
 def _build_styles():
     styles = getSampleStyleSheet()
     body = ParagraphStyle(
@@ -36,6 +47,8 @@ def _build_styles():
         alignment=TA_LEFT,
         spaceAfter=8,
     )
+    # Parts of a long message before its last one, without a gap between them
+    chunk = ParagraphStyle("Chunk", parent=body, spaceAfter=0)
     role = ParagraphStyle(
         "Role",
         parent=styles["Heading5"],
@@ -62,7 +75,15 @@ def _build_styles():
         textColor="#555555",
         spaceAfter=12,
     )
-    return {"body": body, "role": role, "title": title, "meta": meta}
+    return {"body": body, "chunk": chunk, "role": role, "title": title, "meta": meta}
+
+
+def _get_styles():
+    # The styles never change, build them once per process
+    global _styles
+    if _styles is None:
+        _styles = _build_styles()
+    return _styles
 
 
 def _add_page_numbers(canvas, doc):
@@ -73,8 +94,62 @@ def _add_page_numbers(canvas, doc):
     canvas.restoreState()
 
 
+def _split_text(text, limit=CHUNK_CHARS):
+    """Yield parts of `text` of at most `limit` characters, cut at a line break or a space when possible."""
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        yield text[:cut]
+        text = text[cut:].lstrip("\n ")
+    yield text
+
+
+def _message_flowables(messages, styles):
+    """Paragraphs of `messages`, made one message at a time as the layout asks for them."""
+    for msg in messages:
+        if not isinstance(msg, dict) or "role" not in msg or "content" not in msg:
+            raise ValueError("`messages` must be dicts with keys 'role' and 'content'.")
+        role_text = str(msg.get("role", "")).strip() or "Unknown"
+        content_text = str(msg.get("content", "")).strip()
+
+        yield Paragraph(escape(role_text), styles["role"])
+        chunks = list(_split_text(content_text))
+        for i, chunk in enumerate(chunks):
+            # Preserve newlines in content
+            yield Paragraph(escape(chunk).replace("\n", "<br/>"), styles["body"] if i == len(chunks) - 1 else styles["chunk"])
+
+
+class _FlowableStream(list):
+    """
+    The story of a document, refilled from an iterator of flowables as reportlab lays them out,
+    so only about LOOKAHEAD of them exist at a time.
+
+    This relies on an internal of reportlab: BaseDocTemplate.build consumes the story with
+    `while len(flowables):` and pops from its front (reportlab 3.x to 5.x). _conversation_to_pdf
+    checks the whole story was consumed, so a reportlab that reads it differently fails the
+    export instead of writing a truncated PDF.
+    """
+
+    def __init__(self, flowables):
+        super().__init__()
+        self.source = iter(flowables)
+
+    def __len__(self):
+        if self.source is not None and list.__len__(self) < LOOKAHEAD:
+            for flowable in self.source:
+                self.append(flowable)
+                if list.__len__(self) >= 2 * LOOKAHEAD:
+                    break
+            else:
+                self.source = None
+        return list.__len__(self)
+
+
 def _conversation_to_pdf(messages, output_path, title="Conversation", exported_at_text=None):
-    styles = _build_styles()
+    styles = _get_styles()
     doc = SimpleDocTemplate(
         output_path,
         pagesize=A4,
@@ -85,23 +160,18 @@ def _conversation_to_pdf(messages, output_path, title="Conversation", exported_a
         title=title,
         author="Conversation Exporter",
         subject="Chat transcript",
+        pageCompression=1,
     )
 
-    story = []
-    story.append(Paragraph(escape(title), styles["title"]))
+    header = [Paragraph(escape(title), styles["title"])]
     if exported_at_text:
-        story.append(Paragraph(escape(exported_at_text), styles["meta"]))
-    story.append(Spacer(1, 6))
-
-    for msg in messages:
-        role_text = str(msg.get("role", "")).strip() or "Unknown"
-        content_text = str(msg.get("content", "")).strip()
-
-        story.append(Paragraph(escape(role_text), styles["role"]))
-        # Preserve newlines in content
-        story.append(Paragraph(escape(content_text).replace("\n", "<br/>"), styles["body"]))
+        header.append(Paragraph(escape(exported_at_text), styles["meta"]))
+    header.append(Spacer(1, 6))
 
+    story = _FlowableStream(itertools.chain(header, _message_flowables(messages, styles)))
     doc.build(story, onFirstPage=_add_page_numbers, onLaterPages=_add_page_numbers)
+    if story.source is not None or list.__len__(story):
+        raise RuntimeError("reportlab stopped before the end of the conversation: this version doesn't lay out a story the way _FlowableStream expects")
 
 
 # -------------------- Public function to be called --------------------
@@ -110,17 +180,20 @@ def export_conversation_to_pdf(messages, output_dir="./outputs/Conversations_PDF
     """
     Create a PDF from `messages` and save it into `output_dir` with a timestamped filename.
 
+    The messages are read a few at a time as the pages are laid out, so `messages` can be a
+    generator and the paragraphs of the whole conversation never exist at once. The finished
+    pages are still held by reportlab until the file is written, so memory grows with the length
+    of the conversation (about 2 MB per 1000 messages of a hundred words).
+
     Args:
-        messages (list[dict]): Each item must have keys 'role' and 'content'.
+        messages (iterable[dict]): Each item must have keys 'role' and 'content'.
         output_dir (str): Directory to write the PDF (default: "./output").
         filename_prefix (str): Optional prefix for the file name (e.g., "chat_").
 
     Returns:
         str: Absolute path to the created PDF.
     """
-    if not isinstance(messages, list) or any(
-        not isinstance(m, dict) or "role" not in m or "content" not in m for m in messages
-    ):
+    if isinstance(messages, (str, bytes, dict)):
         raise ValueError("`messages` must be a list of dicts with keys 'role' and 'content'.")
 
     # Ensure output directory exists
@@ -129,5 +202,39 @@ def export_conversation_to_pdf(messages, output_dir="./outputs/Conversations_PDF
     output_path = os.path.abspath(os.path.join(output_dir, filename))
 
     title = "Conversation"
-    _conversation_to_pdf(messages, output_path, title=title, exported_at_text=f"Exported on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    return output_path
\ No newline at end of file
+    # A message found invalid halfway through mustn't leave a broken PDF behind
+    partial_path = output_path + ".part"
+    try:
+        _conversation_to_pdf(messages, partial_path, title=title, exported_at_text=f"Exported on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return output_path
+
+
+# -------------------- Background exports --------------------
+
+# Layout of long transcripts takes seconds, so GUI exports run in worker processes
+EXPORT_WORKERS = 2
+_export_pool = None
+
+def _get_export_pool():
+    global _export_pool
+    if _export_pool is None:
+        # "spawn" because forking a process that runs Qt threads is not safe
+        _export_pool = ProcessPoolExecutor(max_workers=EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _export_pool
+
+def export_conversation_to_pdf_async(messages, output_dir="./outputs/Conversations_PDF/", filename_prefix="", name="output"):
+    """
+    Same as export_conversation_to_pdf, but rendered in a background process.
+
+    `messages` is copied when submitted, so later changes to the conversation don't affect
+    the export.
+
+    Returns:
+        concurrent.futures.Future: resolves to the absolute path of the PDF, or raises the export error.
+    """
+    snapshot = [dict(m) if isinstance(m, dict) else m for m in messages]
+    return _get_export_pool().submit(export_conversation_to_pdf, snapshot, output_dir, filename_prefix, name)
@@ -0,0 +1,224 @@
+"""
+Compact archive of a saved conversation (.csa), an alternative to the indented JSON files.
+
+Layout:
+  MAGIC                                   8 bytes
+  record*                                 <u32 length> zlib(JSON {"role": "A"|"B"|..., "content": str})
+  index                                   <u64 offset> of every record, in order
+  footer                                  <u64 index offset> <u32 records> END_MAGIC
+
+Messages are appended without rewriting the ones already stored: the index and footer are
+replaced by the new records and written again after them. Readers memory-map the file and only
+decompress the records they're asked for, e.g. the last N messages. A file whose footer is
+missing (a crash while appending) is read by walking the records from the start.
+
+Converting saved conversations:
+  python archive.py convert outputs/Conversations_JSON/*.json
+  python archive.py show outputs/Archives/night1.csa --last 5
+"""
+
+import argparse
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+
+ARCHIVE_DIR = Path(__file__).resolve().parent / "outputs" / "Archives"
+EXTENSION = ".csa"
+MAGIC = b"CSARCH1\n"
+END_MAGIC = b"CSAX"
+LENGTH = struct.Struct("<I")
+FOOTER = struct.Struct("<QI4s")
+
+def is_archive(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def _encode(msg):
+    data = json.dumps({"role": msg["role"], "content": msg["content"]}, ensure_ascii=False, separators=(",", ":"))
+    record = zlib.compress(data.encode("utf-8"), 6)
+    return LENGTH.pack(len(record)) + record
+
+def _write_index(f, offsets):
+    index_offset = f.tell()
+    index = array("Q", offsets)
+    if sys.byteorder == "big":
+        index.byteswap()
+    f.write(index.tobytes())
+    f.write(FOOTER.pack(index_offset, len(offsets), END_MAGIC))
+
+class ArchiveReader:
+    """
+    Read-only view of an archive: len(), reader[i], reader.last(n) and iteration decompress only
+    the messages asked for. Use it as a context manager or close() it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < len(MAGIC) or self.file.read(len(MAGIC)) != MAGIC:
+            self.file.close()
+            raise ValueError(f"{path} is not a conversation archive")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size > len(MAGIC) else None
+        self.offsets, self.end = self._read_index(size)
+
+    def _read_index(self, size):
+        """(record offsets, end of the records) from the footer, or found by walking the records."""
+        if size >= len(MAGIC) + FOOTER.size:
+            index_offset, count, end_magic = FOOTER.unpack_from(self.map, size - FOOTER.size)
+            if end_magic == END_MAGIC and index_offset + 8 * count + FOOTER.size == size:
+                offsets = array("Q")
+                offsets.frombytes(self.map[index_offset:index_offset + 8 * count])
+                if sys.byteorder == "big":
+                    offsets.byteswap()
+                return offsets, index_offset
+        offsets = array("Q")
+        position = len(MAGIC)
+        while position + LENGTH.size <= size:
+            (length,) = LENGTH.unpack_from(self.map, position)
+            end = position + LENGTH.size + length
+            if end > size or not self._valid(position):
+                break
+            offsets.append(position)
+            position = end
+        return offsets, position
+
+    def _valid(self, offset):
+        try:
+            self._decode(offset)
+            return True
+        except ValueError:
+            return False
+
+    def _decode(self, offset):
+        (length,) = LENGTH.unpack_from(self.map, offset)
+        start = offset + LENGTH.size
+        try:
+            data = zlib.decompress(self.map[start:start + length])
+        except zlib.error as e:
+            raise ValueError(f"damaged record at byte {offset} of {self.path}: {e}")
+        return json.loads(data.decode("utf-8"))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        return self._decode(self.offsets[index])
+
+    def __iter__(self):
+        for offset in self.offsets:
+            yield self._decode(offset)
+
+    def last(self, n):
+        """The last `n` messages, reading nothing before them."""
+        return [self._decode(offset) for offset in self.offsets[max(0, len(self.offsets) - n):]]
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_archive(path, messages):
+    """Write `messages` ({"role", "content"}) as a new archive at `path`, replacing it atomically."""
+    partial_path = str(path) + ".part"
+    offsets = []
+    with open(partial_path, "wb") as f:
+        f.write(MAGIC)
+        for msg in messages:
+            offsets.append(f.tell())
+            f.write(_encode(msg))
+        _write_index(f, offsets)
+    os.replace(partial_path, path)
+
+def append_to_archive(path, messages):
+    """Add `messages` at the end of the archive at `path` (created when missing); return its length."""
+    if not os.path.exists(path):
+        messages = list(messages)
+        write_archive(path, messages)
+        return len(messages)
+    with ArchiveReader(path) as reader:
+        offsets, end = list(reader.offsets), reader.end
+    with open(path, "r+b") as f:
+        # The index and footer (or a record cut short by a crash) are overwritten
+        f.seek(end)
+        f.truncate()
+        for msg in messages:
+            offsets.append(f.tell())
+            f.write(_encode(msg))
+        _write_index(f, offsets)
+    return len(offsets)
+
+def read_archive(path):
+    with ArchiveReader(path) as reader:
+        return list(reader)
+
+def read_conversation(path):
+    """Messages of a saved conversation, as an archive or as the legacy JSON file."""
+    if is_archive(path):
+        return read_archive(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def convert(paths, output_dir=ARCHIVE_DIR):
+    """Write an archive of each saved JSON conversation in `paths`; return [(source, archive, sizes)]."""
+    os.makedirs(output_dir, exist_ok=True)
+    converted = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            messages = json.load(f)
+        target = Path(output_dir) / (Path(path).stem + EXTENSION)
+        write_archive(target, messages)
+        converted.append((path, target, os.path.getsize(path), os.path.getsize(target)))
+    return converted
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert saved ConvoSimul conversations to compact archives, or show one.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert_parser = commands.add_parser("convert", help="Convert JSON conversations to archives")
+    convert_parser.add_argument("inputs", nargs="+", help="JSON files or glob patterns")
+    convert_parser.add_argument("--output-dir", default=str(ARCHIVE_DIR), help="Where the archives are written (default: outputs/Archives)")
+    show_parser = commands.add_parser("show", help="Print the last messages of an archive")
+    show_parser.add_argument("archive")
+    show_parser.add_argument("--last", type=int, default=10, help="Messages to print (default: 10)")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        with ArchiveReader(args.archive) as reader:
+            print(f"{args.archive}: {len(reader)} messages")
+            for msg in reader.last(args.last):
+                print(f"\n{msg['role']}: {msg['content']}")
+        return 0
+
+    paths = []
+    for pattern in args.inputs:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    failures = 0
+    before = after = 0
+    for path in paths:
+        try:
+            (source, target, source_size, target_size), = convert([path], args.output_dir)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            failures += 1
+            print(f"[failed] {path}: {e}")
+            continue
+        before += source_size
+        after += target_size
+        print(f"[ok] {source} -> {target}: {source_size / 1024:.1f} KB -> {target_size / 1024:.1f} KB")
+    if after:
+        print(f"{len(paths) - failures}/{len(paths)} converted, {before / 1024:.1f} KB -> {after / 1024:.1f} KB ({before / after:.1f}x smaller)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
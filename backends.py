@@ -0,0 +1,273 @@
+"""
+LLM backends talk() can send requests to, selected with "backend" in setupModels.json.
+
+  "azure"              Azure OpenAI, using "endpoint", "api_version" and "key" (default)
+  "openai_compatible"  any server speaking the OpenAI chat-completions protocol at "base_url",
+                       e.g. the bundled stand-in: python fake_server.py --port 8000
+"""
+
+import abc
+import hashlib
+import socket
+import threading
+
+# The openai SDK takes about a second to import: it is loaded with the first client, so the
+# windows open without it
+
+# Idle connections are kept open long enough to survive the pause between turns
+KEEPALIVE_SECONDS = 120
+MAX_KEEPALIVE_CONNECTIONS = 20
+# How often a watched request checks whether it was cancelled
+CANCEL_POLL_SECONDS = 0.1
+
+# Process-wide pool of clients keyed by (endpoint, api_version, key)
+_clients = {}
+_clients_lock = threading.Lock()
+
+class TalkCancelled(Exception):
+    """Raised by talk() when its cancel_event is set before the response arrives."""
+
+def close_stream(stream):
+    """
+    Close an SDK stream another thread may be reading: its socket is shut down first, as closing
+    it alone doesn't wake a read blocked on it.
+    """
+    response = getattr(stream, "response", None)
+    network_stream = response.extensions.get("network_stream") if response is not None else None
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            # Already closed by the server
+            pass
+    stream.close()
+
+class CancelWatch:
+    """
+    Closes `stream` from a watcher thread as soon as `cancel_event` is set, while the context is
+    open: a read waiting on the server is interrupted and the connection dropped, so the server
+    stops generating and the thread reading is freed.
+    """
+
+    def __init__(self, stream, cancel_event):
+        self.stream = stream
+        self.cancel_event = cancel_event
+        self.done = threading.Event()
+
+    def __enter__(self):
+        threading.Thread(target=self._watch, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+
+    def _watch(self):
+        # Only is_set() is asked of the event, like talk() does, so composite events work too
+        while not self.cancel_event.is_set():
+            if self.done.wait(CANCEL_POLL_SECONDS):
+                return
+        close_stream(self.stream)
+
+def _http_client():
+    # httpx is always installed alongside openai; fall back to the SDK default just in case
+    from openai import DefaultHttpxClient
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_SECONDS,
+        )
+    )
+
+def get_client(api_version, endpoint, key):
+    """Return the pooled client for this endpoint, creating it on first use.
+
+    `api_version` None means a plain OpenAI-compatible server at `endpoint`."""
+    pool_key = (endpoint, api_version, key)
+    with _clients_lock:
+        client = _clients.get(pool_key)
+        if client is None:
+            from openai import AzureOpenAI, OpenAI
+            if api_version is None:
+                client = OpenAI(base_url=endpoint, api_key=key, http_client=_http_client(), max_retries=0)
+            else:
+                client = AzureOpenAI(
+                    api_version=api_version,
+                    azure_endpoint=endpoint,
+                    api_key=key,
+                    http_client=_http_client(),
+                    # Retries are scheduled by talk(), see rate_limiter.py
+                    max_retries=0,
+                )
+            _clients[pool_key] = client
+    return client
+
+def close_clients():
+    """Close the pooled clients and their connections, when the app exits."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+def is_retryable(error):
+    """True for rate limiting (429), server errors (5xx), timeouts and dropped connections."""
+    from openai import APIConnectionError, APIStatusError
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    # APITimeoutError is a subclass
+    return isinstance(error, APIConnectionError)
+
+def retry_after_seconds(error):
+    """The wait requested by the server's retry-after-ms or Retry-After header, or None."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        if response.headers.get("retry-after-ms"):
+            return float(response.headers["retry-after-ms"]) / 1000
+        if response.headers.get("retry-after"):
+            return float(response.headers["retry-after"])
+    except ValueError:
+        # An HTTP date instead of seconds; fall back to exponential backoff
+        pass
+    return None
+
+def usage_dict(usage):
+    """Token counts of an SDK usage object as {"prompt_tokens", "completion_tokens", "cached_tokens"}."""
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", None) if details is not None else None,
+    }
+
+class Backend(abc.ABC):
+    """Answers chat completions through a pooled OpenAI SDK client; subclasses say which one."""
+
+    # Ask for a last stream chunk carrying the token usage ("stream_usage" in setupModels.json)
+    stream_usage = True
+    # Send a "prompt_cache_key" naming the conversation ("prompt_cache_key" in setupModels.json)
+    prompt_cache_key = False
+    # Seconds without an answer (or, streaming, without a chunk) before a request fails with a
+    # retryable timeout ("request_timeout_seconds" in setupModels.json)
+    request_timeout = 300.0
+
+    @abc.abstractmethod
+    def client(self):
+        """The pooled SDK client of this backend's endpoint."""
+
+    def cache_routing(self, msgs):
+        """
+        Extra request fields keeping requests with the same system prompt on the same prompt
+        cache; the key is a hash of that prompt, so every turn of a speaker shares it.
+        """
+        if not self.prompt_cache_key or not msgs:
+            return {}
+        key = hashlib.sha256(str(msgs[0].get("content", "")).encode("utf-8")).hexdigest()[:32]
+        return {"extra_body": {"prompt_cache_key": key}}
+
+    def complete(self, msgs, dep, seed, max_tokens, cancel_event=None):
+        """
+        Return (reply text, token usage as returned by usage_dict).
+
+        With `cancel_event` the reply is streamed, so that setting the event closes the connection
+        and raises TalkCancelled instead of leaving the request running.
+        """
+        if cancel_event is not None:
+            return self._complete_streamed(msgs, dep, seed, max_tokens, cancel_event)
+        response = self.client().chat.completions.create(
+            messages=msgs,
+            model=dep,
+            max_completion_tokens=max_tokens,
+            n=1,
+            seed=seed,
+            timeout=self.request_timeout,
+            **self.cache_routing(msgs),
+            )
+        return response.choices[0].message.content, usage_dict(response.usage)
+
+    def _complete_streamed(self, msgs, dep, seed, max_tokens, cancel_event):
+        if cancel_event.is_set():
+            raise TalkCancelled()
+        parts, usage = [], None
+        try:
+            stream = self.stream(msgs, dep, seed, max_tokens)
+            with stream, CancelWatch(stream, cancel_event):
+                for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = usage_dict(chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+        except Exception:
+            # Closing the stream under the reader fails the read with a connection error
+            if cancel_event.is_set():
+                raise TalkCancelled()
+            raise
+        if cancel_event.is_set():
+            raise TalkCancelled()
+        return "".join(parts), usage
+
+    def stream(self, msgs, dep, seed, max_tokens):
+        """Return the SDK stream of chunks for the reply."""
+        extra = {"stream_options": {"include_usage": True}} if self.stream_usage else {}
+        extra.update(self.cache_routing(msgs))
+        return self.client().chat.completions.create(
+            messages=msgs,
+            model=dep,
+            max_completion_tokens=max_tokens,
+            n=1,
+            seed=seed,
+            stream=True,
+            timeout=self.request_timeout,
+            **extra,
+            )
+
+    def warm_up(self):
+        # Any cheap authenticated request opens the TLS connection
+        self.client().models.list()
+
+class AzureBackend(Backend):
+    def __init__(self, settings):
+        self.api_version = settings.get("api_version")
+        self.key = settings.get("key")
+        self.endpoint = settings.get("endpoint")
+        if not all([self.api_version, self.key, self.endpoint]):
+            raise ValueError("Missing one or more required fields in setupModels.json")
+
+    def client(self):
+        return get_client(self.api_version, self.endpoint, self.key)
+
+class OpenAICompatibleBackend(Backend):
+    def __init__(self, settings):
+        self.base_url = settings.get("base_url")
+        # Local servers usually ignore the key, but the SDK requires one
+        self.key = settings.get("key") or "not-needed"
+        if not self.base_url:
+            raise ValueError('"base_url" is required in setupModels.json for the openai_compatible backend')
+
+    def client(self):
+        return get_client(None, self.base_url, self.key)
+
+BACKENDS = {
+    "azure": AzureBackend,
+    "openai_compatible": OpenAICompatibleBackend,
+}
+
+def backend_from_settings(settings):
+    name = settings.get("backend") or "azure"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r} in setupModels.json, expected one of: {', '.join(BACKENDS)}")
+    backend = BACKENDS[name](settings)
+    # Older API versions reject stream_options
+    backend.stream_usage = bool(settings.get("stream_usage", True))
+    # Not every server or API version accepts it
+    backend.prompt_cache_key = bool(settings.get("prompt_cache_key", False))
+    backend.request_timeout = float(settings.get("request_timeout_seconds", Backend.request_timeout))
+    return backend
@@ -0,0 +1,181 @@
+"""
+Headless batch runner: plays many presets (as written by "Save Presets") without the GUI.
+
+Usage:
+  python batch_runner.py outputs/presets/*.json --concurrency 8
+  python batch_runner.py night/*.json --conversation outputs/Conversations_JSON/start1.json --turns 20
+
+Every conversation writes <file name>.json into outputs/Conversations_JSON and
+<file name>.pdf into outputs/Conversations_PDF, like the conversation window does; presets of
+the same batch sharing a file name get <file name>_2, _3... The JSON files
+are added to the search index of the library (library.py).
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from archive import read_conversation
+from backends import close_clients
+from conversation import get_response_cache, routing_stats
+from conversation_engine import ConversationEngine
+from presets import parse_model_config, parse_participants, new_transcript
+from schedulers import make_scheduler
+from transcript import entries_from_json
+from journal import Journal, new_journal_path
+from metrics import CallMetrics, new_metrics_path
+from PDFer import export_conversation_to_pdf
+from library import record
+from settings import CONFIG_PATH, load_config
+
+BASE_DIR = Path(__file__).resolve().parent
+JSON_DIR = BASE_DIR / "outputs" / "Conversations_JSON"
+PDF_DIR = BASE_DIR / "outputs" / "Conversations_PDF"
+
+def default_deployment():
+    # The GUI preselects the first configured model for both speakers
+    models = load_config().get("models") or []
+    for model in models:
+        if isinstance(model, dict) and model.get("deployment"):
+            return model["deployment"]
+    raise ValueError(f"No models found in {CONFIG_PATH}")
+
+def output_name(presets, preset_path):
+    """Name of the files a preset's run writes: its "file_name", or the preset file's name."""
+    name = presets.get("file_name", "").strip() or Path(preset_path).stem
+    if name.lower().endswith(".json"):
+        name = name[:-5]
+    return name
+
+def unique_output_names(paths):
+    """
+    Output name of each preset in `paths`; a name used by an earlier preset of the batch gets
+    a counter (night, night_2, night_3...) so the runs don't overwrite each other's files.
+    """
+    names, used = [], set()
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                name = output_name(json.load(f), path)
+        except (OSError, ValueError, AttributeError):
+            # run_preset reports the problem
+            name = Path(path).stem
+        unique, counter = name, 1
+        while unique.lower() in used:
+            counter += 1
+            unique = f"{name}_{counter}"
+        used.add(unique.lower())
+        names.append(unique)
+    return names
+
+def run_preset(preset_path, conversation=None, turns=None, model_A=None, model_B=None, pdf=True, speculative=False, name=None):
+    """
+    Play one preset to the end and save its outputs, as `name` (output_name() by default);
+    return (output name, turns played, referee stopped, tokens saved, tokens used).
+    """
+    with open(preset_path, "r", encoding="utf-8") as f:
+        presets = json.load(f)
+
+    name_A = presets.get("name_A", "").strip()
+    name_B = presets.get("name_B", "").strip()
+    setup_1 = presets.get("sys_A", "").strip()
+    setup_2 = presets.get("sys_B", "").strip()
+    if not setup_1 or not setup_2:
+        raise ValueError("Preset is missing a system prompt")
+    if turns is None:
+        turns_text = str(presets.get("turns", "")).strip()
+        turns = int(turns_text) if turns_text.isdigit() and int(turns_text) > 0 else 3
+    deploy_A = model_A or presets.get("model_A") or default_deployment()
+    deploy_B = model_B or presets.get("model_B") or default_deployment()
+    config_A = parse_model_config(presets.get("seed_A", ""), presets.get("max_tokens_A", ""), presets.get("color_A", ""), "#FF0000")
+    config_B = parse_model_config(presets.get("seed_B", ""), presets.get("max_tokens_B", ""), presets.get("color_B", ""), "#0000FF")
+
+    participants = parse_participants(presets)
+    entries = entries_from_json(conversation) if conversation is not None else None
+    transcript = new_transcript(setup_1, setup_2, name_A, name_B, config_A, config_B, entries, participants)
+    start_len = len(transcript)
+
+    name = name or output_name(presets, preset_path)
+
+    engine = ConversationEngine(deploy_A, deploy_B, transcript, config_A, config_B, [p["model"] or deploy_A for p in participants])
+    engine.scheduler = make_scheduler(presets.get("scheduler"), moderator_deployment=deploy_A)
+    engine.broadcast = bool(presets.get("broadcast", False))
+    # Same journal as the GUI writes, so a crashed overnight run can be resumed from the app
+    engine.journal = Journal(new_journal_path(name), {**presets, "model_A": deploy_A, "model_B": deploy_B}, transcript.entries)
+    engine.metrics = CallMetrics(new_metrics_path(name))
+    try:
+        in_context = engine.run(turns, referee=bool(presets.get("referee", False)), speculative=speculative)
+    finally:
+        engine.journal.close()
+        engine.metrics.close()
+    used = sum(stats["prompt_tokens"] + stats["completion_tokens"] for stats in engine.metrics.summary().values())
+    os.makedirs(JSON_DIR, exist_ok=True)
+    with open(JSON_DIR / f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(transcript.to_json(), f, ensure_ascii=False, indent=4)
+    record(JSON_DIR / f"{name}.json", "conversation", transcript.names, engine.deployments)
+    if pdf:
+        export_conversation_to_pdf(messages=transcript.pdf_messages(), output_dir=str(PDF_DIR), name=name)
+    return name, len(transcript) - start_len, not in_context, sum(engine.tokens_saved), used
+
+def expand_paths(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ConvoSimul presets without the GUI.")
+    parser.add_argument("presets", nargs="+", help="Preset files or glob patterns")
+    parser.add_argument("--conversation", help="Saved conversation (JSON or .csa archive) used as the start of every run")
+    parser.add_argument("--concurrency", type=int, default=4, help="Conversations running at the same time (default: 4)")
+    parser.add_argument("--turns", type=int, help="Override the number of turns stored in the presets")
+    parser.add_argument("--model-a", help="Deployment for A when the preset doesn't name one")
+    parser.add_argument("--model-b", help="Deployment for B when the preset doesn't name one")
+    parser.add_argument("--no-pdf", action="store_true", help="Only write the JSON outputs")
+    parser.add_argument("--speculative-referee", action="store_true", help="Generate the next turn while the referee checks the last one")
+    args = parser.parse_args()
+
+    conversation = None
+    if args.conversation:
+        conversation = read_conversation(args.conversation)
+
+    paths = expand_paths(args.presets)
+    names = unique_output_names(paths)
+    started = time.perf_counter()
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = {
+            pool.submit(run_preset, path, conversation, args.turns, args.model_a, args.model_b, not args.no_pdf, args.speculative_referee, name): path
+            for path, name in zip(paths, names)
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                name, played, stopped, saved, used = future.result()
+                note = f", {used} tokens used"
+                note += " (stopped by referee)" if stopped else ""
+                if saved:
+                    note += f", ~{saved} prompt tokens saved by the history budget"
+                print(f"[ok] {path} -> {name}: {played} turns{note}")
+            except Exception as e:
+                failures += 1
+                print(f"[failed] {path}: {e}")
+    elapsed = time.perf_counter() - started
+    print(f"{len(paths) - failures}/{len(paths)} conversations finished in {elapsed:.1f}s")
+    cache = get_response_cache()
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries stored")
+    for dep, stats in routing_stats().items():
+        routes = ", ".join(f"{route['route']} {route['requests']} requests ({route['failures']} failed)" for route in stats["routes"])
+        print(f"Routes of {dep}: {routes}; {stats['hedges']} hedged, {stats['hedges_won']} won by the backup")
+    close_clients()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
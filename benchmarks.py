@@ -0,0 +1,255 @@
+"""
+Benchmark suite: how ConvoSimul scales as a conversation grows.
+
+Usage:
+  python benchmarks.py                                  # 10, 100, 1000 and 5000 turns
+  python benchmarks.py --sizes 10,100 --output before.json
+  python benchmarks.py --compare before.json            # print the change against an earlier run
+
+For every conversation length it measures, against an in-process fake_server with no
+latency (so only ConvoSimul's own work is timed):
+  turn_ms             one turn in the conversation window (Next -> committed and displayed)
+  roundtrip_ms        a bare talk() to the fake server, the floor turn_ms is compared with
+  append_ms           one message appended to the conversation window's transcript view
+  pdf_export_ms       export_conversation_to_pdf of the whole conversation
+  json_save_ms        the window's "Save JSON"
+  load_conversation_ms  the main window's "Load Conversation"
+  peak_memory_kb      peak allocations while building the A, B and PDF histories
+
+Results are written as JSON to outputs/Benchmarks (or --output) for comparison between versions.
+"""
+
+import argparse
+import contextlib
+import gc
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from fake_server import DEFAULT_REPLIES, FakeModel, start_in_background
+from presets import new_transcript
+from transcript import Entry
+
+BASE_DIR = Path(__file__).resolve().parent
+BENCHMARK_DIR = BASE_DIR / "outputs" / "Benchmarks"
+JSON_DIR = BASE_DIR / "outputs" / "Conversations_JSON"
+DEFAULT_SIZES = (10, 100, 1000, 5000)
+CONFIG_A = (None, 1000, "#1f77b4")
+CONFIG_B = (None, 1000, "#d62728")
+# Lower is better for every metric; a change beyond this is flagged by --compare
+REGRESSION_THRESHOLD = 0.10
+
+def make_entries(turns, message_chars):
+    # Distinct strings, so memory isn't understated by sharing
+    entries = []
+    for i in range(turns):
+        text = f"Message {i}. "
+        while len(text) < message_chars:
+            text += DEFAULT_REPLIES[(i + len(text)) % len(DEFAULT_REPLIES)] + " "
+        entries.append(Entry(i % 2, text[:message_chars]))
+    return entries
+
+def make_transcript(entries):
+    return new_transcript("You are A.", "You are B.", "A", "B", CONFIG_A, CONFIG_B, entries)
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def bench_memory(turns, message_chars):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        transcript = make_transcript(make_entries(turns, message_chars))
+        histories = (transcript.messages_for(0), transcript.messages_for(1), transcript.pdf_messages())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del histories
+    return peak / 1024
+
+def bench_pdf(transcript, work_dir, repeat):
+    from PDFer import export_conversation_to_pdf
+    output_dir = os.path.join(work_dir, "pdf")
+    return median_ms(lambda: export_conversation_to_pdf(transcript.pdf_messages(), output_dir=output_dir, name="benchmark"), repeat)
+
+def wait_for_batch(dialog, timeout_ms=600000):
+    from PyQt6.QtCore import QCoreApplication, QEventLoop
+    # The batch is started before this is called and may already be over, so wait on the Next
+    # button the window re-enables when it ends rather than on a signal that could have fired
+    deadline = time.monotonic() + timeout_ms / 1000
+    while not dialog.next_btn.isEnabled():
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"The batch didn't finish in {timeout_ms / 1000:.0f}s")
+        QCoreApplication.processEvents(QEventLoop.ProcessEventsFlag.WaitForMoreEvents, 50)
+    if dialog.failed_run:
+        raise RuntimeError(f"Turn failed: {dialog.transcript_model.rows[-1].text}")
+
+def bench_window(app, main_window, transcript, turns_per_sample, repeat):
+    """Time the conversation window and main window paths on a conversation of len(transcript) turns."""
+    from conversation_window import ConversationDialog
+    results = {}
+    name = f"_benchmark_{len(transcript)}_"
+    talk_args = ("english.json", name, "fake", "fake", transcript, 1, False, "A", "B", CONFIG_A, CONFIG_B)
+    dialog = ConversationDialog(talk_args)
+    dialog.show()
+    try:
+        # The window plays its first turn on its own; wait for it so the connection is warm
+        wait_for_batch(dialog)
+
+        dialog.turns_input.setText(str(turns_per_sample))
+        start = time.perf_counter()
+        dialog.on_next_clicked()
+        wait_for_batch(dialog)
+        app.processEvents()
+        results["turn_ms"] = (time.perf_counter() - start) * 1000 / turns_per_sample
+
+        text = transcript.entries[-1].content
+        def append():
+            dialog.write_message(0, text)
+            app.processEvents()
+        results["append_ms"] = median_ms(append, turns_per_sample)
+
+        results["json_save_ms"] = median_ms(dialog.json_save, repeat)
+        saved = str(JSON_DIR / f"{name}1.json")
+        with mock.patch("main_window.QFileDialog.getOpenFileName", return_value=(saved, "")):
+            def load():
+                main_window.flush_conversation()
+                main_window.load_conversation()
+            results["load_conversation_ms"] = median_ms(load, repeat)
+        main_window.flush_conversation()
+    finally:
+        dialog.shutdown_worker()
+        dialog.deleteLater()
+        for path in glob.glob(str(JSON_DIR / f"{name}*.json")):
+            os.remove(path)
+    return results
+
+def bench_roundtrip(repeat):
+    from conversation import talk
+    msgs = [{"role": "system", "content": "You are A."}, {"role": "user", "content": "Hello"}]
+    talk(msgs, "fake", None, 1000)
+    return median_ms(lambda: talk(msgs, "fake", None, 1000), repeat)
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_benchmarks(sizes, message_chars=600, turns_per_sample=20, repeat=3, skip=()):
+    """Run every benchmark for each conversation length in `sizes` and return the report dict."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    server, base_url = start_in_background(port=0, model=FakeModel(latency_ms=0, tokens_per_sec=0, seed=0))
+    work_dir = tempfile.mkdtemp(prefix="convosimul_bench_")
+    # Point the settings at a setupModels.json of the fake server for the run
+    config_path = Path(work_dir) / "setupModels.json"
+    with config_path.open("w", encoding="utf-8") as f:
+        json.dump({"backend": "openai_compatible", "base_url": base_url, "models": [{"deployment": "fake", "model_name": "fake"}], "lan_pack": "english.json"}, f)
+    patches = contextlib.ExitStack()
+    patches.enter_context(mock.patch("settings.CONFIG_PATH", config_path))
+    # The run's metrics files and library index stay in the work directory too, away from outputs/
+    import library
+    patches.enter_context(mock.patch("metrics.METRICS_DIR", Path(work_dir) / "Metrics"))
+    patches.enter_context(mock.patch("library.LIBRARY_PATH", Path(work_dir) / "library.sqlite3"))
+    patches.enter_context(mock.patch("library._library", library.Library(library.LIBRARY_PATH)))
+    patches.callback(library._library.close)
+
+    app = main_window = None
+    if "gui" not in skip:
+        from PyQt6.QtWidgets import QApplication
+        from main_window import MainWindow
+        app = QApplication.instance() or QApplication(sys.argv)
+        main_window = MainWindow()
+
+    results = []
+    try:
+        roundtrip = bench_roundtrip(turns_per_sample)
+        for turns in sizes:
+            row = {"turns": turns, "roundtrip_ms": roundtrip}
+            print(f"{turns} turns...", flush=True)
+            row["peak_memory_kb"] = bench_memory(turns, message_chars)
+            transcript = make_transcript(make_entries(turns, message_chars))
+            if "pdf" not in skip:
+                row["pdf_export_ms"] = bench_pdf(transcript, work_dir, repeat)
+            if "gui" not in skip:
+                row.update(bench_window(app, main_window, transcript, turns_per_sample, repeat))
+            results.append(row)
+    finally:
+        patches.close()
+        server.shutdown()
+        if main_window is not None:
+            main_window.deleteLater()
+
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "message_chars": message_chars,
+            "turns_per_sample": turns_per_sample,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def print_report(report, baseline=None):
+    metrics = [key for key in report["results"][0] if key != "turns"] if report["results"] else []
+    previous = {row["turns"]: row for row in (baseline or {}).get("results", [])}
+    for row in report["results"]:
+        print(f"\n{row['turns']} turns")
+        for metric in metrics:
+            if metric not in row:
+                continue
+            line = f"  {metric:<22}{row[metric]:>12.2f}"
+            old = previous.get(row["turns"], {}).get(metric)
+            if old:
+                change = (row[metric] - old) / old
+                flag = "  REGRESSION" if change > REGRESSION_THRESHOLD else ""
+                line += f"  {change:+.1%} vs {old:.2f}{flag}"
+            print(line)
+
+def parse_sizes(text):
+    return [int(s) for s in text.split(",") if s.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how ConvoSimul scales with the length of a conversation.")
+    parser.add_argument("--sizes", type=parse_sizes, default=list(DEFAULT_SIZES), help="Comma-separated conversation lengths (default: 10,100,1000,5000)")
+    parser.add_argument("--message-chars", type=int, default=600, help="Length of every message (default: 600)")
+    parser.add_argument("--turns-per-sample", type=int, default=20, help="Turns played and messages appended per length (default: 20)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions of the export, save and load timings (default: 3)")
+    parser.add_argument("--skip", action="append", choices=("pdf", "gui"), default=[], help="Leave out a group of benchmarks")
+    parser.add_argument("--output", help="JSON file for the results (default: outputs/Benchmarks/benchmark_<date>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare with")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.message_chars, args.turns_per_sample, args.repeat, args.skip)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = Path(args.output) if args.output else BENCHMARK_DIR / f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    print(f"\nResults saved to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,260 @@
-import json
-import os
-import re
-from openai import AzureOpenAI
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from backends import backend_from_settings, usage_dict, is_retryable, retry_after_seconds, TalkCancelled, CancelWatch, CANCEL_POLL_SECONDS
+from response_cache import ResponseCache
+from router import router_from_settings
+from rate_limiter import RateLimiter, backoff_delay
+from history import estimate_tokens
+from settings import CONFIG_PATH, load_config
 
-def talk(msgs, dep, seed, max_tokens):
+# Requests that can be cancelled run here so the caller can stop waiting on them
+_request_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="talk")
+
+# Backend built from setupModels.json, rebuilt when the settings change
+_backend = None
+_backend_settings = None
+_backend_lock = threading.Lock()
+
+# Response cache built from the "cache" section of setupModels.json
+_cache = None
+_cache_settings = None
+_cache_lock = threading.Lock()
+
+# Router per deployment listing "routes", with the settings it was built from
+_routers = {}
+_routers_lock = threading.Lock()
+
+# Rate limiter per deployment with the (rpm, tpm) it was built for
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def talk(msgs, dep, seed, max_tokens, cancel_event=None, kind=None, metrics=None):
+    """
+    Send `msgs` to deployment `dep` and return the reply text.
+
+    If `cancel_event` (a threading.Event) is given, the request runs on a pool thread and
+    TalkCancelled is raised as soon as the event is set; the reply is streamed underneath so
+    the event also closes the connection, ending the request and freeing the thread.
+    When the response cache is enabled, an identical earlier request is answered from it.
+    With `metrics` (a metrics.CallMetrics) the call is recorded under `kind`.
+    """
+    cache = get_response_cache()
+    if cache is not None:
+        cache_key = cache.make_key(dep, msgs, seed, max_tokens)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    start = time.perf_counter()
+    usage = None
+    status, error = "error", None
     try:
-        api_version, key, endpoint = load_api_config()
+        if cancel_event is None:
+            result, usage = _complete(msgs, dep, seed, max_tokens)
+        else:
+            future = _request_pool.submit(_complete, msgs, dep, seed, max_tokens, cancel_event)
+            while True:
+                try:
+                    result, usage = future.result(timeout=CANCEL_POLL_SECONDS)
+                    break
+                except FutureTimeout:
+                    if cancel_event.is_set():
+                        future.cancel()
+                        status = "cancelled"
+                        raise TalkCancelled()
+        status = "ok"
+    except Exception as e:
+        if status != "cancelled":
+            error = str(e)
+        raise
+    finally:
+        if metrics is not None:
+            metrics.record(kind, dep, time.perf_counter() - start, usage, status=status, error=error)
+    if cache is not None and result is not None:
+        cache.put(cache_key, result)
+    return result
+
+def talk_stream(msgs, dep, seed, max_tokens, cancel_event=None, kind=None, metrics=None):
+    """
+    Like talk(), but yield the reply as text deltas while the model generates it.
+
+    Setting `cancel_event` closes the HTTP stream, aborting the request, and raises TalkCancelled.
+    A cached reply is yielded in one piece.
+    """
+    cache = get_response_cache()
+    if cache is not None:
+        cache_key = cache.make_key(dep, msgs, seed, max_tokens)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    start = time.perf_counter()
+    first_token = usage = None
+    status, error = "error", None
+    try:
+        router = get_router(dep)
+        if router is not None:
+            request = lambda: router.stream(msgs, seed, max_tokens, cancel_event, get_rate_limiter(dep))
+        else:
+            request = lambda: get_backend().stream(msgs, dep, seed, max_tokens)
+        stream = _with_retries(request, msgs, dep, max_tokens, cancel_event)
+        # The watcher closes the stream as soon as the event is set, even while waiting on a stalled chunk
+        with stream, (CancelWatch(stream, cancel_event) if cancel_event is not None else contextlib.nullcontext()):
+            try:
+                for chunk in stream:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise TalkCancelled()
+                    # The last chunk carries the usage and no choices
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = usage_dict(chunk.usage)
+                    # Azure sends chunks without choices (e.g. content filter results)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        parts.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+            except Exception:
+                # The read interrupted by the watcher closing the stream; raised as a cancel
+                # inside the with, so a router doesn't count it as a failure of the route
+                if cancel_event is not None and cancel_event.is_set():
+                    raise TalkCancelled()
+                raise
+        if cancel_event is not None and cancel_event.is_set():
+            raise TalkCancelled()
+        status = "ok"
+    except (TalkCancelled, GeneratorExit):
+        status = "cancelled"
+        raise
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        if metrics is not None:
+            metrics.record(kind, dep, time.perf_counter() - start, usage, first_token, streamed=True, status=status, error=error)
+    if cache is not None:
+        cache.put(cache_key, "".join(parts))
+
+def get_response_cache():
+    """Return the ResponseCache configured in setupModels.json, or None when caching is off."""
+    global _cache, _cache_settings
+    settings = dict(load_config().get("cache") or {})
+    with _cache_lock:
+        if settings != _cache_settings:
+            # Not closed: other threads may still be in the middle of a get or put on the old
+            # cache; its connection is closed when the last of them lets go of it
+            _cache = None
+            if settings.get("enabled"):
+                _cache = ResponseCache(
+                    settings.get("path", "outputs/response_cache.sqlite3"),
+                    max_entries=int(settings.get("max_entries", 5000)),
+                    max_age_days=settings.get("max_age_days"),
+                )
+            _cache_settings = settings
+        return _cache
+
+def get_backend():
+    """Return the backend selected in setupModels.json."""
+    global _backend, _backend_settings
+    try:
+        settings = load_config()
+        if not settings:
+            raise FileNotFoundError(f"Configuration file not found: {CONFIG_PATH}")
+        with _backend_lock:
+            if settings is not _backend_settings:
+                _backend = backend_from_settings(settings)
+                _backend_settings = settings
+            return _backend
     except Exception as e:
         print("Error loading configuration:", e)
-    client = AzureOpenAI(
-    api_version=api_version,
-    azure_endpoint=endpoint,
-    api_key=key,
-)
-    response = client.chat.completions.create(
-        messages=msgs,
-        model=dep,
-        max_completion_tokens=max_tokens,
-        n=1,
-        seed=seed,
-        )
-    return response.choices[0].message.content
-
-def load_api_config(config_path="config/setupModels.json"):
-    """Load API configuration values from a JSON file."""
-    if not os.path.exists(config_path):
-        raise FileNotFoundError(f"Configuration file not found: {config_path}")
-    
-    with open(config_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    # Extract values
-    api_version = data.get("api_version")
-    key = data.get("key")
-    endpoint = data.get("endpoint")
-    
-    if not all([api_version, key, endpoint]):
-        raise ValueError("Missing one or more required fields in setupModels.json")
-    
-    return api_version, key, endpoint
+        raise
+
+def get_router(dep):
+    """Return the Router of `dep` when its entry in the "models" of setupModels.json lists "routes", or None."""
+    settings = load_config()
+    with _routers_lock:
+        current = _routers.get(dep)
+        # Keep the router (and the health and latencies it tracked) until the settings change
+        if current is None or current[0] is not settings:
+            router = None
+            for model in settings.get("models") or []:
+                if isinstance(model, dict) and model.get("deployment") == dep:
+                    router = router_from_settings(settings, model)
+                    break
+            _routers[dep] = (settings, router)
+        return _routers[dep][1]
+
+def routing_stats():
+    """{deployment: Router.stats()} of the deployments with routes used so far."""
+    with _routers_lock:
+        return {dep: router.stats() for dep, (_, router) in _routers.items() if router is not None}
+
+def get_rate_limiter(dep):
+    """Return the RateLimiter for the "rpm"/"tpm" of `dep` in the "models" of setupModels.json, or None."""
+    limits = (0, 0)
+    for model in load_config().get("models") or []:
+        if isinstance(model, dict) and model.get("deployment") == dep:
+            limits = (int(model.get("rpm") or 0), int(model.get("tpm") or 0))
+            break
+    with _limiters_lock:
+        current = _limiters.get(dep)
+        # Keep the limiter (and its queue) unless the limits were edited
+        if current is None or current[0] != limits:
+            _limiters[dep] = (limits, RateLimiter(*limits) if any(limits) else None)
+        return _limiters[dep][1]
+
+def _wait(seconds, cancel_event=None):
+    deadline = time.monotonic() + seconds
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            raise TalkCancelled()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, CANCEL_POLL_SECONDS))
+
+def _with_retries(request, msgs, dep, max_tokens, cancel_event=None):
+    """
+    Return `request()` once it fits the deployment's rate limits, retrying rate limiting (429)
+    and transient errors with jittered exponential backoff, or after the server's Retry-After.
+    """
+    limiter = get_rate_limiter(dep)
+    retry = load_config().get("retry") or {}
+    max_retries = int(retry.get("max_retries", 8))
+    base_delay = float(retry.get("base_delay_seconds", 1))
+    max_delay = float(retry.get("max_delay_seconds", 60))
+    # Azure counts the prompt plus max_tokens against the TPM quota
+    tokens = estimate_tokens(msgs) + (max_tokens or 0) if limiter is not None else 0
+    attempt = 0
+    while True:
+        if limiter is not None and not limiter.acquire(tokens, cancel_event):
+            raise TalkCancelled()
+        try:
+            return request()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay, retry_after_seconds(e))
+            if limiter is not None and getattr(e, "status_code", None) == 429:
+                # The quota is shared: hold the other conversations on this deployment too
+                limiter.pause(delay)
+            attempt += 1
+            print(f"Retrying {dep} in {delay:.1f}s ({attempt}/{max_retries}): {e}")
+            _wait(delay, cancel_event)
+
+def _complete(msgs, dep, seed, max_tokens, cancel_event=None):
+    router = get_router(dep)
+    if router is not None:
+        return _with_retries(lambda: router.complete(msgs, seed, max_tokens, cancel_event, get_rate_limiter(dep)), msgs, dep, max_tokens, cancel_event)
+    return _with_retries(lambda: get_backend().complete(msgs, dep, seed, max_tokens, cancel_event), msgs, dep, max_tokens, cancel_event)
+
+def warm_up():
+    """Open the pooled connection in the background so the first turn skips the TLS handshake."""
+    def _warm():
+        try:
+            get_backend().warm_up()
+        except Exception as e:
+            # Warm-up is best effort, the real request will report any problem
+            print("Connection warm-up failed:", e)
+    threading.Thread(target=_warm, daemon=True).start()
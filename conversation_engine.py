@@ -0,0 +1,309 @@
+"""
+Qt-free turn logic for conversations between two or more models, shared by the conversation
+window and other front ends.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from conversation import talk, talk_stream, TalkCancelled
+from history import HistoryManager, summary_request
+from referee import Referee, build_context_check
+from schedulers import RoundRobinScheduler
+from settings import load_config
+from transcript import SPEAKERS
+
+# Referee checks run here while the next turn is generated speculatively
+_referee_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="referee")
+# Participants answering the same broadcast round
+_round_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="round")
+# How often _AnyEvent.wait looks at its events
+_ANY_EVENT_POLL_SECONDS = 0.02
+
+class _AnyEvent:
+    """Looks like a threading.Event to talk(): set as soon as any of `events` is set."""
+
+    def __init__(self, *events):
+        self.events = [e for e in events if e is not None]
+
+    def is_set(self):
+        return any(e.is_set() for e in self.events)
+
+    def wait(self, timeout=None):
+        """Like Event.wait: block until one of the events is set or `timeout` seconds passed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.is_set():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            time.sleep(_ANY_EVENT_POLL_SECONDS if remaining is None else min(remaining, _ANY_EVENT_POLL_SECONDS))
+        return True
+
+class _HeldTurn:
+    """Holds back the start signal and streamed deltas of a speculative turn until it is accepted."""
+
+    def __init__(self, speaker, streaming, on_turn_started, on_delta):
+        self.speaker = speaker
+        self.streaming = streaming
+        self.on_turn_started = on_turn_started
+        self.on_delta = on_delta
+        self.buffer = []
+        self.released = False
+        self.lock = threading.Lock()
+
+    def delta(self, text):
+        with self.lock:
+            if not self.released:
+                self.buffer.append(text)
+                return
+        self.on_delta(text)
+
+    def release(self):
+        with self.lock:
+            if self.released:
+                return
+            if self.on_turn_started is not None:
+                self.on_turn_started(self.speaker, self.streaming)
+            if self.buffer and self.on_delta is not None:
+                self.on_delta("".join(self.buffer))
+            self.buffer = []
+            self.released = True
+
+class ConversationEngine:
+    """
+    Advances the conversation stored in a Transcript one turn at a time.
+
+    `config_A`/`config_B` are (seed, max_tokens, color). Participants after A and B answer
+    with `extra_deployments`, their configs come from the transcript. `scheduler` (see
+    schedulers.py) picks who speaks next; with `broadcast` every participant answers at once.
+    """
+
+    def __init__(self, deploy_A, deploy_B, transcript, config_A, config_B, extra_deployments=()):
+        self.deploy_A = deploy_A
+        self.deploy_B = deploy_B
+        self.deployments = [deploy_A, deploy_B, *extra_deployments]
+        self.participants = len(self.deployments)
+        self.transcript = transcript
+        self.configs = [config_A, config_B, *transcript.configs[2:self.participants]]
+        self.context_check = build_context_check(transcript.pdf_messages())
+        # Lexical pre-filter, model and batching of the referee, see the "referee" section of setupModels.json
+        self.referee = Referee(load_config().get("referee") or {}, transcript.system_prompts[:self.participants], deploy_A)
+        # Indexes of committed turns waiting for a batched referee check
+        self.unchecked = []
+        # Optional token budget per speaker, see the "history" section of setupModels.json
+        self.histories = self.build_history_managers(load_config().get("history") or {})
+        # Tokens saved by the history budget for the message each speaker is generating
+        self.pending_saved = {}
+        self.tokens_saved = []
+        # Optional journal.Journal receiving every committed turn and referee verdict
+        self.journal = None
+        # Optional metrics.CallMetrics recording every API call
+        self.metrics = None
+        self.scheduler = RoundRobinScheduler()
+        # Read at every turn, so front ends can toggle them while a batch is running
+        self.referee_enabled = False
+        self.speculative_referee = False
+        self.stream_enabled = False
+        self.broadcast = False
+
+    def build_history_managers(self, settings):
+        budget = int(settings.get("budget_tokens") or 0)
+        if budget <= 0:
+            return [None] * self.participants
+        keep_recent = int(settings.get("keep_recent_turns", 8))
+        max_tokens = int(settings.get("summary_max_tokens", 500))
+
+        def summarizer(dep):
+            def summarize(previous_summary, transcript_text, cancel_event=None):
+                return talk(msgs=summary_request(previous_summary, transcript_text), dep=dep, seed=None, max_tokens=max_tokens, cancel_event=cancel_event, kind="summary", metrics=self.metrics)
+            return summarize
+        return [HistoryManager(budget, keep_recent, summarizer(dep)) for dep in self.deployments]
+
+    def next_speaker(self, cancel_event=None):
+        return self.scheduler.next_speaker(self, cancel_event)
+
+    def generate(self, speaker, cancel_event=None, on_delta=None):
+        """
+        Ask `speaker` for the next message, without committing it.
+
+        When `on_delta` is given the reply is streamed and `on_delta(text)` is called for every
+        chunk; the full message is returned either way.
+        """
+        msgs = self.transcript.messages_for(speaker)
+        dep = self.deployments[speaker]
+        seed, max_tokens, _ = self.configs[speaker]
+        kind = SPEAKERS[speaker]
+        history = self.histories[speaker]
+        self.pending_saved[speaker] = 0
+        if history is not None:
+            msgs = history.view(msgs, cancel_event)
+            self.pending_saved[speaker] = history.last_saved
+        if on_delta is None:
+            return talk(msgs=msgs, dep=dep, seed=seed, max_tokens=max_tokens, cancel_event=cancel_event, kind=kind, metrics=self.metrics)
+        parts = []
+        for delta in talk_stream(msgs=msgs, dep=dep, seed=seed, max_tokens=max_tokens, cancel_event=cancel_event, kind=kind, metrics=self.metrics):
+            parts.append(delta)
+            on_delta(delta)
+        return "".join(parts)
+
+    def commit(self, speaker, result):
+        """Append `result` from `speaker` to the transcript."""
+        self.tokens_saved.append(self.pending_saved.pop(speaker, 0))
+        self.transcript.append(speaker, result)
+        if self.journal is not None:
+            self.journal.turn(len(self.transcript) - 1, speaker, result)
+
+    def referee_check(self, result, cancel_event=None, index=None):
+        """Return False when the referee judges `result` (turn `index`, by default the last committed one) to be out of context."""
+        if index is None:
+            index = len(self.transcript) - 1
+        return self.check_turns([index], cancel_event)
+
+    def check_turns(self, indexes, cancel_event=None):
+        """Referee the committed turns at `indexes` together; return False if any is out of context."""
+        verdicts = self.referee.check(self.transcript, indexes, self.context_check, cancel_event, self.metrics)
+        if self.journal is not None:
+            for index, in_context in verdicts:
+                self.journal.referee(index, in_context)
+        return all(in_context for _, in_context in verdicts)
+
+    def flush_referee(self, cancel_event=None):
+        """Check the turns waiting for a batched referee check; return False if any is out of context."""
+        indexes, self.unchecked = self.unchecked, []
+        try:
+            return self.check_turns(indexes, cancel_event)
+        except Exception:
+            # Checked again with the next batch
+            self.unchecked = indexes + self.unchecked
+            raise
+
+    def play(self, turns, cancel_event=None, on_turn_started=None, on_delta=None, on_commit=None):
+        """
+        Play up to `turns` turns; return False if the referee stopped the conversation.
+
+        Callbacks: on_turn_started(speaker, streaming) before a message is generated,
+        on_delta(text) for every streamed chunk and on_commit(speaker, message) once it
+        is part of the transcript. Raises TalkCancelled when `cancel_event` is set.
+        In broadcast mode a turn is a round in which every participant answers.
+
+        With `speculative_referee` the referee check of a turn runs while the next turn is
+        already being generated. If the referee says no, that next turn is cancelled and
+        never reported, so callers see exactly what serial execution would have produced.
+
+        When the referee checks every K turns (`referee.every_k_turns`), it is called once K
+        turns are waiting and at the end of the batch; the turns after the one out of context
+        are kept.
+        """
+        result = None
+        while turns > 0:
+            if cancel_event is not None and cancel_event.is_set():
+                raise TalkCancelled()
+            if self.broadcast and result is None:
+                in_context = self.play_round(cancel_event, on_turn_started, on_commit)
+                turns -= 1
+                if not in_context:
+                    return False
+                continue
+            if result is None:
+                speaker = self.next_speaker(cancel_event)
+                streaming = self.stream_enabled
+                if on_turn_started is not None:
+                    on_turn_started(speaker, streaming)
+                result = self.generate(speaker, cancel_event, on_delta if streaming else None)
+            self.commit(speaker, result)
+            if on_commit is not None:
+                on_commit(speaker, result)
+            turns -= 1
+            if not self.referee_enabled:
+                result = None
+            elif self.referee.every_k_turns > 1:
+                self.unchecked.append(len(self.transcript) - 1)
+                result = None
+                if len(self.unchecked) >= self.referee.every_k_turns and not self.flush_referee(cancel_event):
+                    return False
+            elif self.speculative_referee and turns > 0:
+                in_context, speaker, result = self.speculate(result, cancel_event, on_turn_started, on_delta)
+                if not in_context:
+                    return False
+            else:
+                if not self.referee_check(result, cancel_event):
+                    return False
+                result = None
+        if self.referee_enabled and self.unchecked:
+            return self.flush_referee(cancel_event)
+        return True
+
+    def play_round(self, cancel_event=None, on_turn_started=None, on_commit=None):
+        """
+        Broadcast round: every participant answers the same transcript concurrently, so the
+        round takes about one request's latency. The replies are committed in participant
+        order once all of them arrived. Return False if the referee rejected any of them.
+        """
+        futures = [_round_pool.submit(self.generate, speaker, cancel_event) for speaker in range(self.participants)]
+        wait(futures)
+        # Raises the first failure (or TalkCancelled); nothing of the round is committed then
+        results = [future.result() for future in futures]
+        start = len(self.transcript)
+        for speaker, result in enumerate(results):
+            if on_turn_started is not None:
+                on_turn_started(speaker, False)
+            self.commit(speaker, result)
+            if on_commit is not None:
+                on_commit(speaker, result)
+        if not self.referee_enabled:
+            return True
+        if self.referee.every_k_turns > 1:
+            self.unchecked.extend(range(start, len(self.transcript)))
+            return len(self.unchecked) < self.referee.every_k_turns or self.flush_referee(cancel_event)
+        verdicts = [_referee_pool.submit(self.referee_check, result, cancel_event, start + i) for i, result in enumerate(results)]
+        return all([verdict.result() for verdict in verdicts])
+
+    def speculate(self, result, cancel_event=None, on_turn_started=None, on_delta=None):
+        """
+        Referee `result` while generating the next turn; return (in_context, next speaker, next message).
+
+        The next message is neither committed nor announced through the callbacks until the
+        referee accepts `result`; when it doesn't, its request is cancelled and None is returned.
+        """
+        rejected = threading.Event()
+        streaming = self.stream_enabled
+
+        def _on_verdict(future):
+            if future.cancelled() or future.exception() is not None or not future.result():
+                rejected.set()
+        verdict = _referee_pool.submit(self.referee_check, result, cancel_event)
+        verdict.add_done_callback(_on_verdict)
+        speculation = _AnyEvent(cancel_event, rejected)
+
+        try:
+            # The scheduler may ask a moderator model, which also overlaps the referee
+            speaker = self.next_speaker(speculation)
+            held = _HeldTurn(speaker, streaming, on_turn_started, on_delta)
+
+            def _release(future):
+                # Accepted: show what was generated so far and stream the rest live
+                if not rejected.is_set():
+                    held.release()
+            # Runs right away if the verdict is already in; callbacks run in order, after _on_verdict
+            verdict.add_done_callback(_release)
+            next_result = self.generate(speaker, speculation, held.delta if streaming and on_delta is not None else None)
+        except TalkCancelled:
+            if cancel_event is not None and cancel_event.is_set():
+                raise
+            next_result = None
+        except Exception:
+            # A failed speculative turn only matters if the referee lets the conversation go on
+            if not verdict.result():
+                return False, None, None
+            raise
+        # Referee errors surface here, just like they would when checking serially
+        if not verdict.result():
+            return False, None, None
+        held.release()
+        return True, speaker, next_result
+
+    def run(self, turns, referee=False, speculative=False, cancel_event=None, on_commit=None):
+        """Play up to `turns` turns without a UI; return False if the referee stopped the conversation."""
+        self.referee_enabled = referee
+        self.speculative_referee = speculative
+        return self.play(turns, cancel_event, on_commit=on_commit)
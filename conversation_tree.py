@@ -0,0 +1,136 @@
+"""
+Conversation tree: a conversation and its forks share every message before the fork point.
+
+Each message is stored once, as a node pointing to the message before it. A branch is the path
+from the root to its newest node, so forking K branches at turn t costs K new nodes per turn
+generated instead of K copies of the first t messages.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from transcript import Transcript
+
+# Forked branches generate here, all at once
+_fork_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fork")
+
+class Node:
+    """One message of the tree; `depth` is the number of messages up to and including it."""
+    __slots__ = ("parent", "entry", "depth", "children")
+
+    def __init__(self, parent, entry):
+        self.parent = parent
+        self.entry = entry
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.children = []
+
+class TreePath:
+    """
+    The entries from the root of `tree` to `tip`, usable as Transcript.entries:
+    append() adds a node after the tip and moves the tip to it.
+    """
+
+    def __init__(self, tree, tip):
+        self.tree = tree
+        self.tip = tip
+
+    def __len__(self):
+        return self.tip.depth
+
+    def node_at(self, depth):
+        """The node after the first `depth` messages of this path (the root for 0)."""
+        if not 0 <= depth <= self.tip.depth:
+            raise IndexError(f"No message {depth} in a path of {self.tip.depth}")
+        node = self.tip
+        while node.depth > depth:
+            node = node.parent
+        return node
+
+    def to_list(self):
+        entries = []
+        node = self.tip
+        while node.parent is not None:
+            entries.append(node.entry)
+            node = node.parent
+        entries.reverse()
+        return entries
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __getitem__(self, index):
+        # The newest messages are read every turn, don't rebuild the path for them
+        if isinstance(index, int) and index in (-1, self.tip.depth - 1) and self.tip.parent is not None:
+            return self.tip.entry
+        return self.to_list()[index]
+
+    def append(self, entry):
+        self.tip = self.tree.add(self.tip, entry)
+
+class Branch:
+    """
+    A line of the conversation: `transcript` reads and extends its path in the tree.
+
+    `fork_depth` is the number of messages shared with the branch it was forked from,
+    `settings` describes what it changed (seed, max_tokens, model) for display.
+    """
+
+    def __init__(self, name, transcript, fork_depth=0, settings=None, engine=None):
+        self.name = name
+        self.transcript = transcript
+        self.fork_depth = fork_depth
+        self.settings = settings or {}
+        self.engine = engine
+        self.status = "idle"
+        self.error = None
+
+class ConversationTree:
+    """
+    Holds the conversation of `transcript` as the "main" branch; its entries are moved into
+    the tree, so what the conversation window appends is shared with later forks.
+    """
+
+    def __init__(self, transcript):
+        self.root = Node(None, None)
+        self.lock = threading.Lock()
+        path = TreePath(self, self.root)
+        for entry in transcript.entries:
+            path.append(entry)
+        transcript.entries = path
+        self.branches = [Branch("main", transcript)]
+
+    def add(self, parent, entry):
+        node = Node(parent, entry)
+        # Branches growing in parallel may add to the same parent
+        with self.lock:
+            parent.children.append(node)
+        return node
+
+    def fork(self, source, depth, configs, name, settings=None):
+        """
+        Return a new Branch continuing the first `depth` messages of `source` (a Transcript in
+        this tree) with `configs`, the (seed, max_tokens, color) of every participant.
+        """
+        transcript = Transcript(source.system_prompts, source.names, configs)
+        transcript.entries = TreePath(self, source.entries.node_at(depth))
+        branch = Branch(name, transcript, depth, settings)
+        with self.lock:
+            self.branches.append(branch)
+        return branch
+
+    def run(self, branch, turns, referee=False, cancel_event=None, on_commit=None):
+        """
+        Play `turns` turns of `branch` (its `engine` must be set) on the fork pool, calling
+        `on_commit(speaker, message)` on the pool's thread after each turn; return the Future,
+        which resolves to the branch.
+        """
+        def _play():
+            branch.status = "running"
+            try:
+                in_context = branch.engine.run(turns, referee=referee, cancel_event=cancel_event, on_commit=on_commit)
+                branch.status = "done" if in_context else "stopped"
+            except Exception as e:
+                branch.status = "failed"
+                branch.error = str(e)
+                raise
+            return branch
+        return _fork_pool.submit(_play)
@@ -1,9 +1,9 @@
 import os
 import json
+import threading
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QDialog,
-    QTextEdit,
     QPushButton,
     QVBoxLayout,
     QHBoxLayout,
@@ -11,181 +11,398 @@ from PyQt6.QtWidgets import (
     QApplication,
     QLineEdit,
     QCheckBox,
+    QLabel,
 )
-from PyQt6.QtGui import QColor
-from PDFer import export_conversation_to_pdf
+from PyQt6.QtCore import QTimer, pyqtSignal
+from conversation_tree import ConversationTree
+from metrics import CallMetrics, new_metrics_path
+from settings import language_pack, load_config
+from transcript import SPEAKERS
+from transcript_view import TranscriptModel, TranscriptView
 
-def import_lan_pack(language):
-    language_path = Path(__file__).resolve().parent / "language_packs" / language
-    if not language_path.exists():
-        first_lan = os.listdir(Path(__file__).resolve().parent / "language_packs")[0]
-        language_path = Path(__file__).resolve().parent / "language_packs" / first_lan
-    with language_path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+# Streamed text is written to the view at most this many times per second
+STREAM_FPS = 30
 
 class ConversationDialog(QDialog):
-    def __init__(self, talk_args: tuple, parent=None):
+    run_turns = pyqtSignal(int)
+    pdf_export_finished = pyqtSignal(object)  # concurrent.futures.Future of a background export
+    fork_finished = pyqtSignal(object)  # concurrent.futures.Future of a forked branch
+    branch_turn_committed = pyqtSignal()
+
+    def __init__(self, talk_args: tuple, parent=None, journal=None, extra_deployments=(), scheduler="round_robin", broadcast=False):
         super().__init__(parent)
-        self.language, self.name, self.deploy_A, self.deploy_B, self.A, self.B, self.PDF, self.turns, self.passed_referee, self.name_A, self.name_B, self.config_A, self.config_B = talk_args
-        self.lan_pack = import_lan_pack(self.language).get("conversation_window.py")
+        self.journal = journal
+        # Participants after A and B: their names and configs are in the transcript
+        self.extra_deployments = list(extra_deployments)
+        self.scheduler_name = scheduler
+        self.language, self.name, self.deploy_A, self.deploy_B, self.transcript, self.turns, self.passed_referee, self.name_A, self.name_B, self.config_A, self.config_B = talk_args
+        self.lan_pack = language_pack(self.language, "conversation_window.py")
         self.setWindowTitle(self.lan_pack.get("window_title"))
         self.resize(700, 500)
         self.seed_A, self.max_tokens_A, self.color_A = self.config_A
         self.seed_B, self.max_tokens_B, self.color_B = self.config_B
-        self.turn = True
+        self.names = list(self.transcript.names)
+        self.colors = [config[2] for config in self.transcript.configs]
+        self.worker = None
+        self.worker_thread = None
+        self.failed_run = False
         self.save_N_pdf = 1
+        self.pending_exports = set()
+        self.quitting = False
         self.save_N_json = 1
-        self.output = QTextEdit(self)
-        self.output.setReadOnly(True)
+        # Only the visible messages are painted, appending stays cheap on long conversations
+        self.transcript_model = TranscriptModel(self.names, self.colors, self)
+        self.output = TranscriptView(self.transcript_model, self)
         self.referee = QCheckBox(self.lan_pack.get("referee_checkbox_text"))
+        self.speculative = QCheckBox(self.lan_pack.get("speculative_referee_checkbox_text"))
+        self.stream = QCheckBox(self.lan_pack.get("stream_checkbox_text"))
+        self.stream.setChecked(True)
+        self.broadcast = QCheckBox(self.lan_pack.get("broadcast_checkbox_text"))
+        self.broadcast.setChecked(broadcast)
+        # Deltas received since the last repaint and whether the last message is being streamed
+        self.stream_buffer = []
+        self.streaming = False
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setInterval(1000 // STREAM_FPS)
+        self.stream_timer.timeout.connect(self.flush_stream)
         self.turns_input = QLineEdit()
         self.turns_input.setPlaceholderText(self.lan_pack.get("turns_placeholder"))
         self.next_btn = QPushButton(self.lan_pack.get("next_button_text"))
+        self.cancel_btn = QPushButton(self.lan_pack.get("cancel_button_text"))
+        self.cancel_btn.setEnabled(False)
         self.stop_btn = QPushButton(self.lan_pack.get("stop_button_text"))
         self.save_btn = QPushButton(self.lan_pack.get("save_to_PDF_button_text"))
         self.save_json = QPushButton(self.lan_pack.get("save_to_JSON_button_text"))
+        self.save_archive = QPushButton(self.lan_pack.get("save_to_archive_button_text"))
+        # Messages already in this session's archive, later saves only append the new ones
+        self.archived = 0
+        self.fork_btn = QPushButton(self.lan_pack.get("fork_button_text"))
+        self.branches_btn = QPushButton(self.lan_pack.get("branches_button_text"))
+        # Every message is stored once in the tree, forks share the messages before their fork point
+        self.tree = ConversationTree(self.transcript)
+        self.fork_cancel = threading.Event()
+        # Future of each running fork -> its branch
+        self.pending_forks = {}
+        self.branches_window = None
         self.status_label = QMessageBox(self)
+        # Live latency and token totals of the API calls, also written to outputs/Metrics
+        self.metrics = CallMetrics(new_metrics_path(self.name))
+        self.metrics_label = QLabel()
 
         btns = QHBoxLayout()
         btns.addStretch(1)
         btns.addWidget(self.referee)
+        btns.addWidget(self.speculative)
+        btns.addWidget(self.stream)
+        btns.addWidget(self.broadcast)
         btns.addWidget(self.turns_input)
         btns.addWidget(self.next_btn)
+        btns.addWidget(self.cancel_btn)
         btns.addWidget(self.stop_btn)
         btns.addWidget(self.save_btn)
         btns.addWidget(self.save_json)
+        btns.addWidget(self.save_archive)
+        btns.addWidget(self.fork_btn)
+        btns.addWidget(self.branches_btn)
 
         layout = QVBoxLayout(self)
         layout.addWidget(self.output)
         layout.addLayout(btns)
+        layout.addWidget(self.metrics_label)
         layout.addWidget(self.status_label)
 
         self.next_btn.clicked.connect(self.on_next_clicked)
+        self.cancel_btn.clicked.connect(self.on_cancel_clicked)
         self.stop_btn.clicked.connect(self.on_stop_clicked)
         self.save_btn.clicked.connect(self.on_save_clicked)
         self.save_json.clicked.connect(self.json_save)
+        self.save_archive.clicked.connect(self.archive_save)
+        self.pdf_export_finished.connect(self.on_pdf_export_finished)
+        self.fork_btn.clicked.connect(self.on_fork_clicked)
+        self.branches_btn.clicked.connect(self.on_branches_clicked)
+        self.fork_finished.connect(self.on_fork_finished)
+        self.branch_turn_committed.connect(self.refresh_branches)
         self.referee.setChecked(self.passed_referee)
 
         # Setup
-        for msg in self.A:
-            if msg["role"] == "assistant":
-                self.output.setTextColor(QColor(self.color_A))
-                self.output.append(f"{self.name_A}: " + "\n" + msg["content"] + "\n")
-            if msg["role"] == "user":
-                self.output.setTextColor(QColor(self.color_B))
-                self.output.append(f"{self.name_B}: " + "\n" + msg["content"] + "\n")
-        self.context_check = "Given the following conversation and system prompts reply with just yes or no, if the last message is still keeping the same context (some messages might be missing, just consider if the new message is a possible continuation of this context), context:\n"
-        for msg in self.PDF:
-            self.context_check += msg["role"] + ": " + msg["content"] + "\n"
-        self.context_check += "New message: \n"
-
-        # Check turn
-        if len(self.A) % 2 == 1:
-            self.turn = True
-        else:
-            self.turn = False
+        self.transcript_model.extend((entry.speaker, entry.content) for entry in self.transcript.entries)
+
+        # Lazy import so a bad conversation.py doesn't kill the window before it shows.
+        try:
+            from conversation_engine import ConversationEngine
+            from schedulers import make_scheduler
+            from turn_worker import TurnWorker, start_worker_thread
+        except Exception as e:
+            QMessageBox.critical(self, self.lan_pack.get("import_talk_function_error_1"), f"{self.lan_pack.get('import_talk_function_error_2')}{e}")
+            self.next_btn.setEnabled(False)
+            self.fork_btn.setEnabled(False)
+            return
+        self.engine = self.new_engine(self.transcript, [self.deploy_A, self.deploy_B, *self.extra_deployments], [self.config_A, self.config_B])
+        self.engine.journal = self.journal
+        self.engine.referee_enabled = self.referee.isChecked()
+        self.engine.speculative_referee = self.speculative.isChecked()
+        self.engine.stream_enabled = self.stream.isChecked()
+        self.worker = TurnWorker(self.engine)
+        self.worker_thread = start_worker_thread(self.worker)
+        self.run_turns.connect(self.worker.run)
+        self.worker.turn_started.connect(self.on_turn_started)
+        self.worker.delta.connect(self.stream_buffer.append)
+        self.worker.turn_committed.connect(self.on_turn_committed)
+        self.worker.tokens_saved.connect(self.on_tokens_saved)
+        self.worker.out_of_context.connect(self.on_out_of_context)
+        self.worker.cancelled.connect(self.on_cancelled)
+        self.worker.failed.connect(self.on_failed)
+        self.worker.finished.connect(self.on_batch_finished)
+        self.referee.toggled.connect(self.on_referee_toggled)
+        self.speculative.toggled.connect(self.on_speculative_toggled)
+        self.stream.toggled.connect(self.on_stream_toggled)
+        self.broadcast.toggled.connect(self.on_broadcast_toggled)
+
         self.turns_input.setText(str(self.turns))
         self.on_next_clicked()
 
+    def new_engine(self, transcript, deployments, configs):
+        # Already imported by __init__ when the window has an engine
+        from conversation_engine import ConversationEngine
+        from schedulers import make_scheduler
+        engine = ConversationEngine(deployments[0], deployments[1], transcript, configs[0], configs[1], deployments[2:])
+        engine.scheduler = make_scheduler(self.scheduler_name, moderator_deployment=deployments[0])
+        engine.broadcast = self.broadcast.isChecked()
+        engine.metrics = self.metrics
+        return engine
+
     def on_next_clicked(self):
         self.turns = int(self.turns_input.text().strip()) if self.turns_input.text().strip().isdigit() and int(self.turns_input.text().strip()) > 0 else 1
         self.turns_input.clear()
         # Scroll to beginning of next output
-        cursor = self.output.textCursor()
-        cursor.movePosition(cursor.MoveOperation.End)
-        self.output.setTextCursor(cursor)
-        while self.turns > 0:
-            # Lazy import so a bad conversation.py doesn't kill the window before it shows.
-            try:
-                from conversation import talk
-            except Exception as e:
-                QMessageBox.critical(self, self.lan_pack.get("import_talk_function_error_1"), f"{self.lan_pack.get('import_talk_function_error_2')}{e}")
-                return
-
-            try:
-                if self.turn:
-                    result = talk(msgs=self.A, dep=self.deploy_A, seed=self.seed_A, max_tokens=self.max_tokens_A)
-                else:
-                    result = talk(msgs=self.B, dep=self.deploy_B, seed=self.seed_B, max_tokens=self.max_tokens_B)
-            except Exception as e:
-                # Show error in the text area and disable Next
-                self.output.append(f"\n{self.lan_pack.get('import_talk_function_output')}: {e}")
-                self.next_btn.setEnabled(False)
-                return
-
-            # Append result to output
-            if self.output.toPlainText():
-                if self.turn:
-                    self.output.setTextColor(QColor(self.color_A))
-                    self.output.append("\n" + f"{self.name_A}: " + "\n")
-                else:
-                    self.output.setTextColor(QColor(self.color_B))
-                    self.output.append("\n" + f"{self.name_B}: " + "\n")
-                self.output.append("\n" + result)
-            else:
-                if self.turn:
-                    self.output.setTextColor(QColor(self.color_A))
-                    self.output.setPlainText(f"{self.name_A}: " + "\n")
-                else:
-                    self.output.setTextColor(QColor(self.color_B))
-                    self.output.setPlainText(f"{self.name_B}: " + "\n")
-                self.output.append(result)
-
-            # Append new message to message lists and change turn
-            if self.turn:
-                self.A.append({"role": "assistant", "content": result})
-                self.B.append({"role": "user", "content": result})
-                self.PDF.append({"role": f"{self.name_A}:", "content": result})
+        self.output.scroll_to_end()
+        # The turn loop runs on the worker thread, results come back through on_turn_committed
+        self.failed_run = False
+        self.next_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.run_turns.emit(self.turns)
+
+    def write_message(self, speaker, result):
+        # Append result to output
+        self.transcript_model.append_message(speaker, result)
+
+    def on_turn_started(self, speaker, streaming):
+        if not streaming:
+            return
+        # Write the header now, the body is filled in by flush_stream as deltas arrive
+        self.streaming = True
+        self.write_message(speaker, "")
+        self.stream_timer.start()
+
+    def flush_stream(self):
+        if not self.stream_buffer:
+            return
+        text = "".join(self.stream_buffer)
+        self.stream_buffer.clear()
+        self.transcript_model.extend_last(text)
+
+    def discard_stream(self):
+        # Remove a partially streamed message that will never be committed
+        if not self.streaming:
+            return
+        self.stream_timer.stop()
+        self.stream_buffer.clear()
+        self.transcript_model.remove_last()
+        self.streaming = False
+
+    def on_turn_committed(self, speaker, result):
+        if self.streaming:
+            self.stream_timer.stop()
+            self.flush_stream()
+            self.transcript_model.finish_last()
+            self.streaming = False
+        else:
+            self.write_message(speaker, result)
+        self.turns -= 1
+        self.update_metrics_panel()
+
+    def update_metrics_panel(self):
+        summary = self.metrics.summary()
+        parts = []
+        labels = [(SPEAKERS[i], self.transcript.label(i)) for i in range(len(self.names))]
+        labels += [("referee", self.lan_pack.get("metrics_referee_label")), ("moderator", self.lan_pack.get("metrics_moderator_label"))]
+        for kind, label in labels:
+            stats = summary.get(kind)
+            # Referee checks settled by the lexical pre-filter make no API call
+            local = self.engine.referee.local_decisions if kind == "referee" else 0
+            if stats is None:
+                if local:
+                    parts.append(f"{label}: {local} {self.lan_pack.get('metrics_referee_local_label')}")
+                continue
+            if stats["p50"] is None:
+                latency = "p50 - · p95 -"
             else:
-                self.A.append({"role": "user", "content": result})
-                self.B.append({"role": "assistant", "content": result})
-                self.PDF.append({"role": f"{self.name_B}:", "content": result})
-            self.turn = not self.turn
-            if self.referee.isChecked():
-                # Context checker
-                print("entered here")
-                context_temp = self.context_check + result + "\n reply with just yes or no."
-                context_msg = [{"role": "system", "content": "Your'e a context checker, your response will be used in a program so strictly reply just yes or no"}, {"role": "user", "content": context_temp}]
-                try:
-                    from conversation import talk
-                except Exception as e:
-                    QMessageBox.critical(self, self.lan_pack.get("import_talk_function_error_1"), f"{self.lan_pack.get('import_talk_function_error_2')}{e}")
-                    return
-                try:
-                    stop = talk(msgs=context_msg, dep=self.deploy_A, seed=None, max_tokens=100)
-                    stop = stop.lower().strip()
-                    print(stop)
-                    if("no" in stop):
-                        self.turns = 0
-                        self.status_label.setText(self.lan_pack.get("out_of_context"))
-                except Exception as e:
-                    # Show error in the text area and disable Next
-                    self.output.append(f"\n{self.lan_pack.get('import_talk_function_output')}: {e}")
-                    self.next_btn.setEnabled(False)
-                    return
-            self.turns -= 1
+                latency = f"p50 {stats['p50']:.2f}s · p95 {stats['p95']:.2f}s"
+            if stats["first_token_p50"] is not None:
+                latency += f" · {self.lan_pack.get('metrics_first_token_label')} {stats['first_token_p50']:.2f}s"
+            tokens = f"{stats['prompt_tokens'] + stats['completion_tokens']} {self.lan_pack.get('metrics_tokens_label')}"
+            if stats["cached_tokens"]:
+                # Share of the prompts served from the server's prompt cache
+                tokens += f" ({stats['cached_tokens']} {self.lan_pack.get('metrics_cached_label')}, {stats['cached_tokens'] / max(1, stats['prompt_tokens']):.0%})"
+            if local:
+                tokens += f" · {local} {self.lan_pack.get('metrics_referee_local_label')}"
+            parts.append(f"{label}: {latency} · {tokens}")
+        self.metrics_label.setText("   |   ".join(parts))
+
+    def on_tokens_saved(self, saved, total):
+        self.status_label.setText(f"{self.lan_pack.get('history_trimmed_status_1')} {saved} {self.lan_pack.get('history_trimmed_status_2')} {total}")
+
+    def on_out_of_context(self):
+        self.turns = 0
+        self.status_label.setText(self.lan_pack.get("out_of_context"))
+
+    def on_cancelled(self):
+        self.discard_stream()
+        self.status_label.setText(self.lan_pack.get("cancelled_status"))
+
+    def on_failed(self, error):
+        self.discard_stream()
+        # Show error in the text area; Next stays available to retry from the last committed turn
+        self.transcript_model.append_message(None, f"{self.lan_pack.get('import_talk_function_output')}: {error}")
+        self.failed_run = True
+        self.status_label.setText(self.lan_pack.get("turn_failed_status"))
+
+    def on_batch_finished(self):
+        # The referee's calls finish after the last committed turn
+        self.update_metrics_panel()
+        # Drop the room left under the last streamed message
+        self.output.fit_last()
+        self.cancel_btn.setEnabled(False)
+        self.next_btn.setEnabled(True)
+
+    def on_cancel_clicked(self):
+        if self.worker is not None:
+            self.cancel_btn.setEnabled(False)
+            self.worker.cancel()
+
+    def on_referee_toggled(self, checked):
+        self.engine.referee_enabled = checked
+
+    def on_speculative_toggled(self, checked):
+        self.engine.speculative_referee = checked
+
+    def on_stream_toggled(self, checked):
+        self.engine.stream_enabled = checked
+
+    def on_broadcast_toggled(self, checked):
+        self.engine.broadcast = checked
+
+    def shutdown_worker(self):
+        # Abort any in-flight request and stop the worker thread
+        if self.worker_thread is not None:
+            self.worker.cancel()
+            self.worker_thread.quit()
+            self.worker_thread.wait()
+            self.worker_thread = None
+        # Forked branches stop at their next API call
+        self.fork_cancel.set()
+        for branch in self.pending_forks.values():
+            branch.engine.metrics.close()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        self.metrics.close()
+
+    def closeEvent(self, event):
+        self.shutdown_worker()
+        super().closeEvent(event)
+
+    def reject(self):
+        # Escape closes the dialog without a closeEvent
+        self.shutdown_worker()
+        super().reject()
 
     def on_stop_clicked(self):
-        # Close the entire program
-        export_conversation_to_pdf(messages=self.PDF, name=self.name)
-        QApplication.instance().quit()
-        self.close()
-    
+        # Close the entire program once the final PDF and any pending exports are written
+        self.shutdown_worker()
+        self.quitting = True
+        for btn in (self.next_btn, self.cancel_btn, self.stop_btn, self.save_btn, self.save_json, self.fork_btn):
+            btn.setEnabled(False)
+        self.export_pdf(self.name)
+        self.status_label.setText(self.lan_pack.get("pdf_waiting_exports_status"))
+
     def on_save_clicked(self):
-        export_conversation_to_pdf(messages=self.PDF, name=self.name + str(self.save_N_pdf))
+        self.export_pdf(self.name + str(self.save_N_pdf))
         self.save_N_pdf += 1
 
+    def export_pdf(self, name, transcript=None):
+        # Rendered in a background process from a snapshot of the transcript; reportlab is only loaded there
+        from PDFer import export_conversation_to_pdf_async
+        transcript = transcript or self.transcript
+        future = export_conversation_to_pdf_async(messages=transcript.pdf_messages(), name=name)
+        self.pending_exports.add(future)
+        self.status_label.setText(f"{self.lan_pack.get('pdf_export_started_status')} {name}.pdf")
+        # The callback runs on a pool thread, the signal brings the result back to the GUI thread
+        future.add_done_callback(self.pdf_export_finished.emit)
+
+    def on_pdf_export_finished(self, future):
+        self.pending_exports.discard(future)
+        try:
+            path = future.result()
+            self.status_label.setText(f"{self.lan_pack.get('pdf_export_done_status')} {path}")
+        except Exception as e:
+            print(f"Error exporting PDF: {e}")
+            self.status_label.setText(f"{self.lan_pack.get('pdf_export_failed_status')} {e}")
+        if self.quitting and not self.pending_exports:
+            QApplication.instance().quit()
+            self.close()
+
+    def on_fork_clicked(self):
+        from tree_window import ForkDialog
+        deployments = [model["deployment"] for model in load_config().get("models", [])]
+        dialog = ForkDialog(self.lan_pack, len(self.transcript), deployments, self)
+        if not dialog.exec():
+            return
+        depth = dialog.at_turn.value()
+        turns = dialog.turns.value()
+        for settings in dialog.branch_settings():
+            configs = []
+            for seed, max_tokens, color in self.transcript.configs:
+                configs.append((settings["seed"] if settings["seed"] is not None else seed, settings["max_tokens"] or max_tokens, color))
+            # A changed model answers for every participant of the branch
+            deployments = [settings["model"] or dep for dep in self.engine.deployments]
+            name = str(len(self.tree.branches))
+            branch = self.tree.fork(self.transcript, depth, configs, name, settings)
+            branch.engine = self.new_engine(branch.transcript, deployments, configs)
+            # Each branch's calls in a file of their own, apart from the conversation's and each other's
+            branch.engine.metrics = CallMetrics(new_metrics_path(f"{self.name}_branch{name}"))
+            # The branches window follows the running branches turn by turn
+            future = self.tree.run(branch, turns, self.referee.isChecked(), self.fork_cancel, lambda speaker, message: self.branch_turn_committed.emit())
+            self.pending_forks[future] = branch
+            future.add_done_callback(self.fork_finished.emit)
+        self.status_label.setText(f"{self.lan_pack.get('fork_started_status')} {len(self.pending_forks)}")
+        self.refresh_branches()
+
+    def on_fork_finished(self, future):
+        self.pending_forks.pop(future).engine.metrics.close()
+        try:
+            branch = future.result()
+            self.status_label.setText(f"{self.lan_pack.get('fork_finished_status')} {branch.name}")
+        except Exception as e:
+            print(f"Error in forked branch: {e}")
+            self.status_label.setText(f"{self.lan_pack.get('fork_failed_status')} {e}")
+        self.refresh_branches()
+
+    def on_branches_clicked(self):
+        from tree_window import BranchesDialog
+        if self.branches_window is None:
+            self.branches_window = BranchesDialog(self.tree, self.lan_pack, self.name, self)
+        self.branches_window.refresh()
+        self.branches_window.show()
+        self.branches_window.raise_()
+
+    def refresh_branches(self):
+        if self.branches_window is not None and self.branches_window.isVisible():
+            self.branches_window.refresh()
+
     def json_save(self):
         file_name = self.name + str(self.save_N_json)
-        msgs = []
-        for msg in self.A:
-            temp = None
-            if msg["role"] == "assistant":
-                temp = {"role": "A", "content": msg["content"]}
-            if msg["role"] == "user":
-                temp = {"role": "B", "content": msg["content"]}
-            if temp is not None:
-                msgs.append(temp)
+        msgs = self.transcript.to_json()
         # Ensure the subfolder 'conversations' exists
         os.makedirs(Path(__file__).resolve().parent / "outputs" / "Conversations_JSON", exist_ok=True)
         # Construct the full path (add .json extension if missing)
@@ -198,4 +415,26 @@ class ConversationDialog(QDialog):
             self.save_N_json += 1
             self.status_label.setText(f"{self.lan_pack.get('JSON_save_success_status')} {file_path}")
         except Exception as e:
-            print(f"Error saving conversation: {e}")
\ No newline at end of file
+            print(f"Error saving conversation: {e}")
+            return
+        from library import record
+        record(file_path, "conversation", self.names, [self.deploy_A, self.deploy_B, *self.extra_deployments])
+
+    def archive_save(self):
+        from archive import ARCHIVE_DIR, EXTENSION, write_archive, append_to_archive
+        from library import record
+        file_path = ARCHIVE_DIR / f"{self.name}{EXTENSION}"
+        msgs = self.transcript.to_json()
+        try:
+            os.makedirs(ARCHIVE_DIR, exist_ok=True)
+            if self.archived:
+                append_to_archive(file_path, msgs[self.archived:])
+            else:
+                # First save of the session: an archive left by an earlier run of the same name is replaced
+                write_archive(file_path, msgs)
+            self.archived = len(msgs)
+            self.status_label.setText(f"{self.lan_pack.get('archive_save_success_status')} {file_path}")
+        except Exception as e:
+            print(f"Error archiving conversation: {e}")
+            return
+        record(file_path, "conversation", self.names, [self.deploy_A, self.deploy_B, *self.extra_deployments])
\ No newline at end of file
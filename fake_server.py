@@ -0,0 +1,268 @@
+"""
+Local stand-in for the chat-completions API, to load test and benchmark ConvoSimul offline.
+
+Usage:
+  python fake_server.py --port 8000 --latency-ms 400 --tokens-per-sec 60 --error-rate 0.02
+
+then in setupModels.json:
+  "backend": "openai_compatible", "base_url": "http://127.0.0.1:8000/v1"
+
+Azure-style paths (/openai/deployments/<name>/chat/completions) are answered too, so the
+"azure" backend can be pointed at it with "endpoint": "http://127.0.0.1:8000".
+Streaming (server-sent events), usage reporting and random 429/500 errors are supported.
+Prompt caching is simulated: a request whose leading messages match an earlier request reports
+them as cached_tokens, and only the rest of the prompt costs --prefill-tokens-per-sec.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLIES = [
+    "That is an interesting point, and I think it deserves a closer look before we move on.",
+    "I see it differently: the assumptions behind that idea do not hold in every case.",
+    "Let me build on that with an example that makes the trade-off easier to see.",
+    "We agree on the goal, so the open question is which approach gets us there sooner.",
+]
+# Like the hosted APIs, prompts shorter than this are never cached
+CACHE_MIN_TOKENS = 1024
+# Message prefixes remembered for the simulated prompt cache
+CACHE_MAX_PREFIXES = 100000
+
+class FakeModel:
+    """
+    Produces replies and timings for the stand-in server.
+
+    Latency to the first token is log-normal around `latency_ms` (spread `latency_sigma`),
+    after which tokens arrive at `tokens_per_sec`. `mode` is "canned" (cycle through
+    `replies`) or "echo" (repeat the last message). A request fails with a 429 or 500 with
+    probability `error_rate`. Questions asking for "yes or no" are answered `referee_answer`,
+    batched referee questions "0" (all in context) or "1" when `referee_answer` is "no".
+    With `prefill_tokens_per_sec` the prompt tokens not found in the prompt cache add to the
+    latency to the first token.
+    """
+
+    def __init__(self, latency_ms=300.0, latency_sigma=0.3, tokens_per_sec=50.0, error_rate=0.0,
+                 mode="canned", replies=None, referee_answer="yes", seed=None, prefill_tokens_per_sec=0.0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.mode = mode
+        self.replies = replies or DEFAULT_REPLIES
+        self.referee_answer = referee_answer
+        self.random = random.Random(seed)
+        self.prefill_tokens_per_sec = prefill_tokens_per_sec
+        self.lock = threading.Lock()
+        self.served = 0
+        self.prefixes = {}
+
+    def first_token_delay(self, uncached_tokens=0):
+        prefill = uncached_tokens / self.prefill_tokens_per_sec if self.prefill_tokens_per_sec > 0 else 0.0
+        if self.latency_ms <= 0:
+            return prefill
+        with self.lock:
+            return self.random.lognormvariate(0.0, self.latency_sigma) * self.latency_ms / 1000 + prefill
+
+    def cached_tokens(self, model_name, messages):
+        """Prompt tokens of the longest run of leading messages seen in an earlier request, then remember this one's."""
+        digest = hashlib.sha256(model_name.encode("utf-8"))
+        cached = tokens = 0
+        with self.lock:
+            for message in messages:
+                digest.update(json.dumps(message, sort_keys=True).encode("utf-8"))
+                key = digest.hexdigest()
+                tokens += prompt_tokens([message])
+                if key in self.prefixes:
+                    cached = tokens
+                    # Most recently used last, so the oldest are dropped first
+                    del self.prefixes[key]
+                self.prefixes[key] = True
+            while len(self.prefixes) > CACHE_MAX_PREFIXES:
+                del self.prefixes[next(iter(self.prefixes))]
+        return cached if cached >= CACHE_MIN_TOKENS else 0
+
+    def token_delay(self):
+        return 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+    def error(self):
+        """Return an HTTP status to fail with, or None."""
+        with self.lock:
+            if self.error_rate > 0 and self.random.random() < self.error_rate:
+                return self.random.choice((429, 500))
+        return None
+
+    def reply_tokens(self, messages, max_tokens):
+        last = str(messages[-1].get("content", "")) if messages else ""
+        if "yes or no" in last.lower():
+            text = self.referee_answer
+        elif "first new message" in last.lower():
+            text = "1" if self.referee_answer.lower().startswith("no") else "0"
+        elif self.mode == "echo":
+            text = last
+        else:
+            with self.lock:
+                text = self.replies[self.served % len(self.replies)]
+                self.served += 1
+        # One word (with its leading space) counts as one token
+        tokens = re.findall(r"\s*\S+", text) or [""]
+        return tokens[:max_tokens] if max_tokens else tokens
+
+def prompt_tokens(messages):
+    return sum(len(str(m.get("content", ""))) // 4 + 4 for m in messages)
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let them wait on delayed ACKs
+    disable_nagle_algorithm = True
+    model = None  # FakeModel, set by make_server
+    quiet = True
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.endswith("/models"):
+            self.send_json(200, {"object": "list", "data": [{"id": "fake", "object": "model", "created": 0, "owned_by": "fake"}]})
+        else:
+            self.send_json(404, {"error": {"message": "Not found", "type": "not_found"}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self.send_json(400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+            return
+        if not path.endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "Not found", "type": "not_found"}})
+            return
+        azure = re.search(r"/deployments/([^/]+)/", path)
+        model_name = azure.group(1) if azure else request.get("model", "fake")
+
+        messages = request.get("messages") or []
+        status = self.model.error()
+        if status is not None:
+            time.sleep(self.model.first_token_delay())
+            headers = {"Retry-After": "1"} if status == 429 else None
+            self.send_json(status, {"error": {"message": f"Simulated {status}", "type": "server_error"}}, headers)
+            return
+
+        max_tokens = request.get("max_completion_tokens") or request.get("max_tokens")
+        tokens = self.model.reply_tokens(messages, max_tokens)
+        cached = self.model.cached_tokens(model_name, messages)
+        usage = {
+            "prompt_tokens": prompt_tokens(messages),
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens(messages) + len(tokens),
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        time.sleep(self.model.first_token_delay(usage["prompt_tokens"] - cached))
+        if request.get("stream"):
+            self.stream_reply(completion_id, model_name, tokens, usage, request)
+        else:
+            time.sleep(self.model.token_delay() * len(tokens))
+            self.send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model_name,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "".join(tokens)}}],
+                "usage": usage,
+            })
+
+    def stream_reply(self, completion_id, model_name, tokens, usage, request):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(choices, extra=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model_name, "choices": choices}
+            chunk.update(extra or {})
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for token in tokens:
+                event([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+                time.sleep(self.model.token_delay())
+            event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if (request.get("stream_options") or {}).get("include_usage"):
+                event([], {"usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the request
+            pass
+
+def make_server(host="127.0.0.1", port=8000, model=None, quiet=True):
+    """Return a ThreadingHTTPServer answering with `model` (port 0 picks a free port)."""
+    handler = type("Handler", (FakeHandler,), {"model": model or FakeModel(), "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def start_in_background(**kwargs):
+    """Start a server on a daemon thread (see make_server); returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server for ConvoSimul.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Median time to first token (default: 300)")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="Spread of the log-normal latency (default: 0.3)")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0, help="Generation speed, 0 for instant (default: 50)")
+    parser.add_argument("--prefill-tokens-per-sec", type=float, default=0.0, help="Prompt processing speed for tokens not in the prompt cache, 0 for instant (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 429/500 (default: 0)")
+    parser.add_argument("--mode", choices=("canned", "echo"), default="canned")
+    parser.add_argument("--replies", help="JSON file with a list of canned replies")
+    parser.add_argument("--referee-answer", default="yes", help='Reply to "yes or no" questions (default: yes)')
+    parser.add_argument("--seed", type=int, help="Seed for latencies and errors, for reproducible runs")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    replies = None
+    if args.replies:
+        with open(args.replies, "r", encoding="utf-8") as f:
+            replies = json.load(f)
+    model = FakeModel(args.latency_ms, args.latency_sigma, args.tokens_per_sec, args.error_rate,
+                      args.mode, replies, args.referee_answer, args.seed, args.prefill_tokens_per_sec)
+    server = make_server(args.host, args.port, model, quiet=not args.verbose)
+    print(f"Fake chat-completions server on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
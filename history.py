@@ -0,0 +1,71 @@
+"""
+Keeps what is sent to a model within a token budget by folding old turns into a summary.
+
+Only the request changes: the engine's A/B/PDF lists keep the full transcript for PDF/JSON.
+"""
+
+# Rough size of a token for the models we use; good enough to keep requests under a budget
+CHARS_PER_TOKEN = 4
+# Per-message overhead of the chat format
+TOKENS_PER_MESSAGE = 4
+
+SUMMARIZER_PROMPT = "You summarize conversations. Merge the previous summary and the new messages into one concise summary that keeps names, facts, decisions and open questions. Reply with the summary only."
+SUMMARY_HEADER = "Summary of the earlier part of this conversation:\n"
+
+def estimate_tokens(msgs):
+    return sum(len(msg["content"]) // CHARS_PER_TOKEN + TOKENS_PER_MESSAGE for msg in msgs)
+
+class HistoryManager:
+    """
+    Builds the request view of one speaker's history.
+
+    The system prompt and the last `keep_recent` messages are always sent verbatim. When the
+    request would exceed `budget_tokens`, everything older is folded into a summary message,
+    which is updated incrementally with only the newly folded messages.
+    `summarize(previous_summary, transcript_text, cancel_event)` returns the new summary text.
+    """
+
+    def __init__(self, budget_tokens, keep_recent, summarize):
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.summarize = summarize
+        self.summary = ""
+        # Messages before this index (after the system prompt) are covered by the summary
+        self.folded = 1
+        self.last_saved = 0
+
+    def view(self, msgs, cancel_event=None):
+        """Return the messages to send instead of `msgs` and record the tokens saved in `last_saved`."""
+        full = estimate_tokens(msgs)
+        if full <= self.budget_tokens and self.folded == 1:
+            self.last_saved = 0
+            return msgs
+        view = self._build(msgs)
+        cut = len(msgs) - self.keep_recent
+        # Fold in one go only when over budget, so the summary isn't rewritten every turn
+        if estimate_tokens(view) > self.budget_tokens and cut > self.folded:
+            self.summary = self.summarize(self.summary, _transcript(msgs[self.folded:cut]), cancel_event)
+            self.folded = cut
+            view = self._build(msgs)
+        self.last_saved = max(0, full - estimate_tokens(view))
+        return view
+
+    def _build(self, msgs):
+        if self.folded == 1:
+            return msgs
+        return [msgs[0], {"role": "system", "content": SUMMARY_HEADER + self.summary}] + msgs[self.folded:]
+
+def _transcript(msgs):
+    lines = []
+    for msg in msgs:
+        speaker = "You" if msg["role"] == "assistant" else "Other speaker"
+        lines.append(f"{speaker}: {msg['content']}")
+    return "\n".join(lines)
+
+def summary_request(previous_summary, transcript_text):
+    """Messages asking a model to merge `transcript_text` into `previous_summary`."""
+    content = ""
+    if previous_summary:
+        content += f"Previous summary:\n{previous_summary}\n\n"
+    content += f"New messages:\n{transcript_text}"
+    return [{"role": "system", "content": SUMMARIZER_PROMPT}, {"role": "user", "content": content}]
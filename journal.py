@@ -0,0 +1,86 @@
+"""
+Append-only JSONL journal of a conversation session, written as the conversation goes.
+
+Each line is one record:
+  {"type": "config", ...}                                 settings the session was started with
+  {"type": "turn", "index": n, "role": "A"|"B", "content": str}
+  {"type": "referee", "index": n, "in_context": bool}     verdict on turn n
+
+Every record is flushed to disk as soon as it is written, so a crash loses at most the turn
+being generated. A half-written last line is ignored when the journal is read back.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from transcript import SPEAKERS, Entry
+
+JOURNAL_DIR = Path(__file__).resolve().parent / "outputs" / "Journals"
+
+def new_journal_path(name):
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+    return JOURNAL_DIR / f"{name or 'conversation'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+
+class Journal:
+    """
+    Appends records to the journal at `path`.
+
+    `config` is written first as the session settings, followed by `entries`, the messages the
+    conversation starts from (empty when resuming a journal that already holds them).
+    """
+
+    def __init__(self, path, config, entries=()):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        # A crash may have left a partial last line; start on a fresh one
+        partial = self.path.exists() and self.path.stat().st_size > 0 and not self.path.read_bytes().endswith(b"\n")
+        self.file = open(self.path, "a", encoding="utf-8")
+        if partial:
+            self.file.write("\n")
+        records = [{"type": "config", **config}]
+        for index, entry in enumerate(entries):
+            records.append({"type": "turn", "index": index, "role": SPEAKERS[entry.speaker], "content": entry.content})
+        self.write(*records)
+
+    def write(self, *records):
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        # The referee may report from another thread while a turn is being committed
+        with self.lock:
+            self.file.write(lines)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def turn(self, index, speaker, content):
+        self.write({"type": "turn", "index": index, "role": SPEAKERS[speaker], "content": content})
+
+    def referee(self, index, in_context):
+        self.write({"type": "referee", "index": index, "in_context": in_context})
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+def read_journal(path):
+    """Return (config, entries, verdicts) from a journal: the last config record, the committed
+    turns in order and {turn index: in_context}."""
+    config = {}
+    entries = []
+    verdicts = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial line left by a crash
+                continue
+            if record.get("type") == "config":
+                config = record
+            elif record.get("type") == "turn" and record.get("role") in SPEAKERS:
+                # Turns are numbered across resumes, a resumed session continues the numbering
+                del entries[record["index"]:]
+                entries.append(Entry(SPEAKERS.index(record["role"]), record["content"]))
+            elif record.get("type") == "referee":
+                verdicts[record["index"]] = record["in_context"]
+    return config, entries, verdicts
@@ -0,0 +1,236 @@
+"""
+Library of saved conversations and presets: a SQLite FTS5 index of outputs/Conversations_JSON,
+outputs/Archives and outputs/presets, searchable by text, speaker names, model and date.
+
+Files are indexed as the app writes them (record()); Library.sync() picks up the ones added,
+changed or deleted outside it, re-reading only the files whose modification time or size changed.
+Files that can't be indexed are remembered the same way and only tried again once they change.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from transcript import SPEAKERS
+from archive import read_conversation
+
+BASE_DIR = Path(__file__).resolve().parent
+LIBRARY_PATH = BASE_DIR / "outputs" / "library.sqlite3"
+# (kind, folder) of the indexed files
+FOLDERS = (
+    ("conversation", BASE_DIR / "outputs" / "Conversations_JSON"),
+    ("conversation", BASE_DIR / "outputs" / "Archives"),
+    ("presets", BASE_DIR / "outputs" / "presets"),
+)
+EXTENSIONS = (".json", ".csa")
+# Words around a match shown in the results
+SNIPPET_WORDS = 16
+
+def conversation_document(data, names=(), models=()):
+    """
+    (text, names, models) of a saved conversation. The file only has the speakers' letters, so
+    the names and models are the ones known when it was saved, the letters otherwise.
+    """
+    if not isinstance(data, list):
+        raise ValueError("not a conversation: expected a list of messages")
+    messages = [msg for msg in data if isinstance(msg, dict)]
+    text = "\n".join(str(msg.get("content", "")) for msg in messages)
+    if not any(names):
+        letters = {str(msg.get("role", "")) for msg in messages}
+        names = [letter for letter in SPEAKERS if letter in letters]
+    return text, " ".join(name for name in names if name), " ".join(model for model in models if model)
+
+def presets_document(data):
+    """(text, names, models) of saved presets: the system prompts and file name, names and deployments."""
+    participants = [p for p in data.get("participants") or [] if isinstance(p, dict)]
+    texts = [data.get("file_name", ""), data.get("sys_A", ""), data.get("sys_B", "")] + [p.get("sys", "") for p in participants]
+    names = [data.get("name_A", ""), data.get("name_B", "")] + [p.get("name", "") for p in participants]
+    models = [data.get("model_A", ""), data.get("model_B", "")] + [p.get("model", "") for p in participants]
+    return (
+        "\n".join(str(text) for text in texts if text),
+        " ".join(str(name) for name in names if name),
+        " ".join(str(model) for model in models if model),
+    )
+
+def prefix_phrase(text):
+    """FTS5 phrase matching `text` as typed, the last word as a prefix ("gpt-4" finds "gpt-4o")."""
+    return '"' + text.replace('"', '""') + '"*'
+
+class Library:
+    """
+    Index of the saved files. `search` returns the newest first, or the best matches first when
+    searching for text.
+    """
+
+    def __init__(self, path=LIBRARY_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared by the GUI and the batch runner's threads, guarded by self.lock
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, kind TEXT NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, modified REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS documents_modified ON documents(modified)")
+        # Files of the folders that couldn't be indexed, skipped by sync() until they change
+        self.db.execute("CREATE TABLE IF NOT EXISTS failures (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL)")
+        # rowid is the id of the document; only the text is tokenized, diacritics ignored
+        self.db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents_text USING fts5("
+            "text, names, models, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        self.db.commit()
+
+    def index_file(self, path, kind, names=(), models=()):
+        """Index (or index again) the file at `path`; `names` and `models` of a conversation if known."""
+        path = Path(path).resolve()
+        stat = path.stat()
+        if kind == "presets":
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = read_conversation(path)
+        with self.lock:
+            row = self.db.execute("SELECT id FROM documents WHERE path = ?", (str(path),)).fetchone()
+            if kind == "presets":
+                document = presets_document(data)
+            else:
+                if row is not None and not any(names):
+                    # Rewritten outside the app: keep the names and models known from when it was saved
+                    known = self.db.execute("SELECT names, models FROM documents_text WHERE rowid = ?", (row[0],)).fetchone()
+                    names, models = (known[0].split(), known[1].split()) if known else ((), ())
+                document = conversation_document(data, names, models)
+            if row is None:
+                doc_id = self.db.execute(
+                    "INSERT INTO documents (path, kind, mtime_ns, size, modified) VALUES (?, ?, ?, ?, ?)",
+                    (str(path), kind, stat.st_mtime_ns, stat.st_size, stat.st_mtime),
+                ).lastrowid
+            else:
+                doc_id = row[0]
+                self.db.execute(
+                    "UPDATE documents SET kind = ?, mtime_ns = ?, size = ?, modified = ? WHERE id = ?",
+                    (kind, stat.st_mtime_ns, stat.st_size, stat.st_mtime, doc_id),
+                )
+                self.db.execute("DELETE FROM documents_text WHERE rowid = ?", (doc_id,))
+            self.db.execute("INSERT INTO documents_text (rowid, text, names, models) VALUES (?, ?, ?, ?)", (doc_id, *document))
+            self.db.execute("DELETE FROM failures WHERE path = ?", (str(path),))
+            self.db.commit()
+
+    def remove(self, path):
+        with self.lock:
+            self._remove(str(Path(path).resolve()))
+            self.db.commit()
+
+    def _remove(self, path):
+        row = self.db.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            self.db.execute("DELETE FROM documents_text WHERE rowid = ?", row)
+            self.db.execute("DELETE FROM documents WHERE id = ?", row)
+
+    def sync(self, folders=FOLDERS):
+        """
+        Bring the index up to date with `folders` ((kind, folder) pairs); return the number of files
+        (re)indexed. Unchanged files aren't opened.
+        """
+        with self.lock:
+            known = {path: (mtime_ns, size) for path, mtime_ns, size in self.db.execute("SELECT path, mtime_ns, size FROM documents")}
+            failed = {path: (mtime_ns, size) for path, mtime_ns, size in self.db.execute("SELECT path, mtime_ns, size FROM failures")}
+        changed = []
+        seen = set()
+        for kind, folder in folders:
+            if not Path(folder).is_dir():
+                continue
+            for entry in os.scandir(folder):
+                if not entry.is_file() or not entry.name.lower().endswith(EXTENSIONS):
+                    continue
+                path = str(Path(entry.path).resolve())
+                seen.add(path)
+                stat = entry.stat()
+                if (stat.st_mtime_ns, stat.st_size) not in (known.get(path), failed.get(path)):
+                    changed.append((path, kind, stat))
+        indexed = 0
+        for path, kind, stat in changed:
+            try:
+                self.index_file(path, kind)
+                indexed += 1
+            except (OSError, ValueError, AttributeError) as e:
+                # Not a conversation or presets file (or half written): leave it out until it changes
+                print(f"Library: skipping {path}: {e}")
+                with self.lock:
+                    self._remove(path)
+                    self.db.execute("INSERT OR REPLACE INTO failures (path, mtime_ns, size) VALUES (?, ?, ?)", (path, stat.st_mtime_ns, stat.st_size))
+                    self.db.commit()
+        with self.lock:
+            for path in set(known) - seen:
+                self._remove(path)
+            self.db.executemany("DELETE FROM failures WHERE path = ?", [(path,) for path in set(failed) - seen])
+            self.db.commit()
+        return indexed
+
+    def search(self, text="", speaker="", model="", kind=None, since=None, until=None, limit=200):
+        """
+        Saved files matching every given filter: words of `text` in the messages or prompts,
+        `speaker` in the names, `model` in the deployments, `kind` ("conversation" or "presets"),
+        saved between the timestamps `since` and `until`. Returns dicts with "path", "kind",
+        "modified", "names", "models" and "snippet", the matches in the snippet between [ and ].
+        """
+        terms = []
+        if text.strip():
+            terms.append("text : (" + " ".join(prefix_phrase(word) for word in text.split()) + ")")
+        if speaker.strip():
+            terms.append("names : " + prefix_phrase(speaker.strip()))
+        if model.strip():
+            terms.append("models : " + prefix_phrase(model.strip()))
+        where, args = [], []
+        if terms:
+            where.append("documents_text MATCH ?")
+            args.append(" AND ".join(terms))
+        if kind:
+            where.append("d.kind = ?")
+            args.append(kind)
+        if since is not None:
+            where.append("d.modified >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("d.modified < ?")
+            args.append(until)
+        snippet = f"snippet(documents_text, 0, '[', ']', '…', {SNIPPET_WORDS})" if text.strip() else "substr(t.text, 1, 200)"
+        query = (
+            f"SELECT d.path, d.kind, d.modified, t.names, t.models, {snippet} "
+            "FROM documents_text t JOIN documents d ON d.id = t.rowid"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + (" ORDER BY rank" if text.strip() else " ORDER BY d.modified DESC")
+            + " LIMIT ?"
+        )
+        with self.lock:
+            rows = self.db.execute(query, (*args, limit)).fetchall()
+        return [
+            {"path": path, "kind": kind, "modified": modified, "names": names, "models": models, "snippet": " ".join(snippet.split())}
+            for path, kind, modified, names, models, snippet in rows
+        ]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+_library = None
+_library_lock = threading.Lock()
+
+def get_library():
+    """The library at LIBRARY_PATH, opened on first use."""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = Library()
+        return _library
+
+def record(path, kind, names=(), models=()):
+    """Index a file just written by the app. A failure is only printed: the file is saved anyway."""
+    try:
+        get_library().index_file(path, kind, names, models)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error indexing {path}: {e}")
@@ -0,0 +1,148 @@
+import time
+from datetime import datetime
+from pathlib import Path
+from PyQt6.QtWidgets import (
+    QDialog,
+    QLineEdit,
+    QComboBox,
+    QCheckBox,
+    QDateEdit,
+    QPushButton,
+    QLabel,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QFormLayout,
+    QHBoxLayout,
+    QVBoxLayout,
+    QAbstractItemView,
+)
+from PyQt6.QtCore import Qt, QDate, QTimer
+from library import get_library
+
+# Pause after the last key press before searching as the user types, in milliseconds
+TYPING_DELAY_MS = 250
+
+class LibraryDialog(QDialog):
+    """
+    Searches the saved conversations and presets; the chosen one is loaded by the main window
+    (parent().open_library_result).
+    """
+
+    def __init__(self, lan_pack, parent=None):
+        super().__init__(parent)
+        self.lan_pack = lan_pack
+        self.results = []
+        self.setWindowTitle(self.lan_pack.get("library_window_title"))
+        self.resize(900, 500)
+        self.text = QLineEdit()
+        self.text.setPlaceholderText(self.lan_pack.get("library_text_placeholder"))
+        self.speaker = QLineEdit()
+        self.model = QLineEdit()
+        self.kind = QComboBox()
+        self.kind.addItem(self.lan_pack.get("library_kind_all"), userData=None)
+        self.kind.addItem(self.lan_pack.get("library_kind_conversation"), userData="conversation")
+        self.kind.addItem(self.lan_pack.get("library_kind_presets"), userData="presets")
+        self.by_date = QCheckBox(self.lan_pack.get("library_date_checkbox_text"))
+        self.date_from = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.date_to = QDateEdit(QDate.currentDate())
+        for edit in (self.date_from, self.date_to):
+            edit.setCalendarPopup(True)
+            edit.setEnabled(False)
+        self.table = QTableWidget(0, 6)
+        self.table.setHorizontalHeaderLabels([
+            self.lan_pack.get("library_date_header"),
+            self.lan_pack.get("library_kind_header"),
+            self.lan_pack.get("library_file_header"),
+            self.lan_pack.get("library_names_header"),
+            self.lan_pack.get("library_models_header"),
+            self.lan_pack.get("library_match_header"),
+        ])
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.ResizeMode.Stretch)
+        self.load_btn = QPushButton(self.lan_pack.get("library_load_button_text"))
+        self.status_label = QLabel("")
+        self.typing_timer = QTimer(self)
+        self.typing_timer.setSingleShot(True)
+        self.typing_timer.setInterval(TYPING_DELAY_MS)
+
+        form = QFormLayout()
+        form.addRow(self.lan_pack.get("library_text_description"), self.text)
+        form.addRow(self.lan_pack.get("library_speaker_description"), self.speaker)
+        form.addRow(self.lan_pack.get("library_model_description"), self.model)
+        form.addRow(self.lan_pack.get("library_kind_description"), self.kind)
+        dates = QHBoxLayout()
+        dates.addWidget(self.by_date)
+        dates.addWidget(self.date_from)
+        dates.addWidget(QLabel("-"))
+        dates.addWidget(self.date_to)
+        dates.addStretch(1)
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.status_label, 1)
+        buttons.addWidget(self.load_btn)
+        layout = QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addLayout(dates)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+        for edit in (self.text, self.speaker, self.model):
+            edit.textChanged.connect(self.typing_timer.start)
+        self.typing_timer.timeout.connect(self.search)
+        self.kind.currentIndexChanged.connect(self.search)
+        self.by_date.toggled.connect(self.on_by_date_toggled)
+        self.date_from.dateChanged.connect(self.search)
+        self.date_to.dateChanged.connect(self.search)
+        self.table.itemDoubleClicked.connect(self.on_load_clicked)
+        self.load_btn.clicked.connect(self.on_load_clicked)
+
+        # Files saved while the app wasn't running (e.g. by the batch runner) are indexed now
+        indexed = get_library().sync()
+        self.search()
+        if indexed:
+            self.status_label.setText(f"{self.status_label.text()} ({self.lan_pack.get('library_indexed_status')} {indexed})")
+
+    def on_by_date_toggled(self, checked):
+        self.date_from.setEnabled(checked)
+        self.date_to.setEnabled(checked)
+        self.search()
+
+    def date_range(self):
+        """(since, until) timestamps of the chosen days, both included; (None, None) without the date filter."""
+        if not self.by_date.isChecked():
+            return None, None
+        start = self.date_from.date().toPyDate()
+        end = self.date_to.date().addDays(1).toPyDate()
+        return (datetime(start.year, start.month, start.day).timestamp(), datetime(end.year, end.month, end.day).timestamp())
+
+    def search(self):
+        since, until = self.date_range()
+        start = time.perf_counter()
+        self.results = get_library().search(self.text.text(), self.speaker.text(), self.model.text(), self.kind.currentData(), since, until)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.table.setRowCount(len(self.results))
+        for row, result in enumerate(self.results):
+            cells = (
+                datetime.fromtimestamp(result["modified"]).strftime("%Y-%m-%d %H:%M"),
+                self.lan_pack.get(f"library_kind_{result['kind']}"),
+                Path(result["path"]).name,
+                result["names"],
+                result["models"],
+                result["snippet"],
+            )
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                item.setToolTip(result["path"] if column == 2 else text)
+                self.table.setItem(row, column, item)
+        self.table.resizeColumnsToContents()
+        self.status_label.setText(f"{len(self.results)} {self.lan_pack.get('library_results_status')} ({elapsed_ms:.0f} ms)")
+
+    def on_load_clicked(self, *args):
+        row = self.table.currentRow()
+        if not 0 <= row < len(self.results):
+            return
+        result = self.results[row]
+        if self.parent().open_library_result(result["kind"], result["path"]):
+            self.accept()
@@ -1,39 +1,26 @@
 from __future__ import annotations
-import json
-import os
-from pathlib import Path
+import multiprocessing
 import sys
 from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import (
     QApplication,
     QMessageBox
 )
+from backends import close_clients
 from main_window import MainWindow
-
-def import_lan_pack():
-    config_path = Path(__file__).resolve().parent / "config" / "setupModels.json"
-    if not config_path.exists():
-        return []  # Don't crash; we'll just show a warning in the UI.
-
-    with config_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    lan_pack = data.get("lan_pack")
-    language_path = Path(__file__).resolve().parent / "language_packs" / lan_pack
-    if not language_path.exists():
-        first_lan = os.listdir(Path(__file__).resolve().parent / "language_packs")[0]
-        language_path = Path(__file__).resolve().parent / "language_packs" / first_lan
-    with language_path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+from settings import language_pack
 
 def main():
     # Create the app no matter what, so we can show dialogs instead of silent exits.
     app = QApplication(sys.argv)
-    lan_pack = import_lan_pack().get("main.py")
+    lan_pack = language_pack(section="main.py")
     try:
         w = MainWindow()
         w.show()
-        sys.exit(app.exec())
+        code = app.exec()
+        # Let the servers see the pooled connections closed instead of dropped
+        close_clients()
+        sys.exit(code)
     except Exception as e:
         # Last-resort visible error if construction failed.
         msg = QMessageBox()
@@ -47,4 +34,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # PDF exports run in spawned worker processes
+    multiprocessing.freeze_support()
     main()
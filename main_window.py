@@ -18,19 +18,16 @@ from PyQt6.QtWidgets import (
     QCheckBox,
 )
 from conversation_window import ConversationDialog
-import re
+from presets import is_hex_color, parse_model_config, parse_participants, new_transcript, SCHEDULERS
+from transcript import entries_from_json
+from archive import read_conversation
+from journal import Journal, new_journal_path, read_journal
+from settings import CONFIG_PATH, LANGUAGE_DIR, load_config, save_config, languages, language_pack
 
 def load_models_config() -> List[Dict[str, Any]]:
-    config_path = Path(__file__).resolve().parent / "config" / "setupModels.json"
-    if not config_path.exists():
-        return []  # Don't crash; we'll just show a warning in the UI.
-
-    with config_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    models = data.get("models")
+    models = load_config().get("models")
     if not isinstance(models, list):
-        return []
+        return []  # Don't crash; we'll just show a warning in the UI.
 
     valid_models = []
     for model in models:
@@ -39,44 +36,22 @@ def load_models_config() -> List[Dict[str, Any]]:
     return valid_models
 
 def load_languages_list() -> List[str]:
-    return os.listdir(Path(__file__).resolve().parent / "language_packs")
-
-def import_lan_pack():
-    config_path = Path(__file__).resolve().parent / "config" / "setupModels.json"
-    if not config_path.exists():
-        return []  # Don't crash; we'll just show a warning in the UI.
-
-    with config_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    lan_pack = data.get("lan_pack")
-    language_path = Path(__file__).resolve().parent / "language_packs" / lan_pack
-    if not language_path.exists():
-        first_lan = os.listdir(Path(__file__).resolve().parent / "language_packs")[0]
-        language_path = Path(__file__).resolve().parent / "language_packs" / first_lan
-    with language_path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    return languages()
 
 def what_language():
-    config_path = Path(__file__).resolve().parent / "config" / "setupModels.json"
-    if not config_path.exists():
-        return []  # Don't crash; we'll just show a warning in the UI.
-
-    with config_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    lan_pack = data.get("lan_pack")
-    return lan_pack
+    return load_config().get("lan_pack")
 
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
-        self.lan_pack = import_lan_pack().get("main_window.py")
+        self.lan_pack = language_pack(section="main_window.py")
         self.setWindowTitle(self.lan_pack.get("window_title"))
         self.resize(560, 420)
-        self.A_load = []
-        self.B_load = []
-        self.PDF_load = []
+        self.loaded_entries = []
+        # Participants after A and B, as listed under "participants" in the loaded presets
+        self.extra_participants = []
+        # Set while resuming, so the new session keeps appending to the same journal
+        self.resume_journal_path = None
         
         # Widgets
         self.language_select = QComboBox()
@@ -122,6 +97,10 @@ class MainWindow(QWidget):
         self.turns = QLineEdit()
         self.turns.setPlaceholderText(self.lan_pack.get("turns_placeholder"))
         self.referee = QCheckBox(self.lan_pack.get("referee_checkbox_text"))
+        self.scheduler_select = QComboBox()
+        for scheduler in SCHEDULERS:
+            self.scheduler_select.addItem(self.lan_pack.get(f"scheduler_{scheduler}"), userData=scheduler)
+        self.broadcast = QCheckBox(self.lan_pack.get("broadcast_checkbox_text"))
         self.file_name = QLineEdit()
         self.file_name.setPlaceholderText(self.lan_pack.get("file_name_placeholder"))
 
@@ -133,6 +112,8 @@ class MainWindow(QWidget):
         self.flag_conversation_loaded = False
         self.load_conversation_btn = QPushButton(self.lan_pack.get("load_conversation_button_text"))
         self.flush_conversation_btn = QPushButton(self.lan_pack.get("flush_conversation_button_text"))
+        self.resume_journal_btn = QPushButton(self.lan_pack.get("resume_journal_button_text"))
+        self.library_btn = QPushButton(self.lan_pack.get("library_button_text"))
         self.status_label = QLabel("")
         self.status_label.setWordWrap(True)
 
@@ -171,6 +152,11 @@ class MainWindow(QWidget):
         temp_HBox.addWidget(QLabel(self.lan_pack.get("referee_description")))
         temp_HBox.addWidget(self.referee)
         settings_row.addLayout(temp_HBox)
+        temp_HBox = QHBoxLayout()
+        temp_HBox.addWidget(QLabel(self.lan_pack.get("scheduler_description")))
+        temp_HBox.addWidget(self.scheduler_select)
+        temp_HBox.addWidget(self.broadcast)
+        settings_row.addLayout(temp_HBox)
         settings_row.addWidget(QLabel(self.lan_pack.get("file_name_description")))
         settings_row.addWidget(self.file_name)
 
@@ -182,6 +168,8 @@ class MainWindow(QWidget):
         btn_row.addWidget(self.load_presets_btn)
         btn_row.addWidget(self.load_conversation_btn)
         btn_row.addWidget(self.flush_conversation_btn)
+        btn_row.addWidget(self.resume_journal_btn)
+        btn_row.addWidget(self.library_btn)
 
         btn_row.addStretch(1)
 
@@ -203,6 +191,8 @@ class MainWindow(QWidget):
         self.load_presets_btn.clicked.connect(self.load_presets)
         self.load_conversation_btn.clicked.connect(self.load_conversation)
         self.flush_conversation_btn.clicked.connect(self.flush_conversation)
+        self.resume_journal_btn.clicked.connect(self.resume_journal)
+        self.library_btn.clicked.connect(self.open_library)
         self.language_select.currentIndexChanged.connect(self.on_language_change)
 
     def populate_combos(self):
@@ -221,7 +211,7 @@ class MainWindow(QWidget):
         if not models or not languages:
             self.status_label.setText(
                 # CHANGE LANG PACK LATER
-                f"{self.lan_pack.get("load_models_no_models")}{Path(__file__).resolve().parent / "config" / "setupModels.json"}"
+                f"{self.lan_pack.get("load_models_no_models")}{CONFIG_PATH}"
             )
             return
 
@@ -233,11 +223,11 @@ class MainWindow(QWidget):
         for lang in languages:
             self.language_select.addItem(lang)
         self.language_select.setCurrentText(what_language())
-        self.status_label.setText(f"{self.lan_pack.get("load_models_loaded_status_1")} {len(models)} {self.lan_pack.get("load_models_loaded_status_2")} {Path(__file__).resolve().parent / "config" / "setupModels.json"}")
+        self.status_label.setText(f"{self.lan_pack.get("load_models_loaded_status_1")} {len(models)} {self.lan_pack.get("load_models_loaded_status_2")} {CONFIG_PATH}")
 
     @staticmethod
     def is_hex_color(s: str) -> bool:
-        return bool(re.fullmatch(r"#([0-9A-Fa-f]{3}|[0-9A-Fa-f]{6})", s))
+        return is_hex_color(s)
 
     def on_start_clicked(self):
         if self.models_combo.count() == 0 or self.models_combo_2.count() == 0:
@@ -274,39 +264,24 @@ class MainWindow(QWidget):
             return
         name_A = self.name_A.text().strip()
         name_B = self.name_B.text().strip()
-        config_A = (
-            int(self.seed_A.text() if self.seed_A.text().strip().isdigit() else 0),
-            int(self.max_tokens_A.text() if self.max_tokens_A.text().strip().isdigit() else 1000),
-            self.color_A.text().strip() if self.is_hex_color(self.color_A.text().strip()) else "#FF0000",
-        )
-        config_B = (
-            int(self.seed_B.text() if self.seed_B.text().strip().isdigit() else 0),
-            int(self.max_tokens_B.text() if self.max_tokens_B.text().strip().isdigit() else 1000),
-            self.color_B.text().strip() if self.is_hex_color(self.color_B.text().strip()) else "#0000FF",
-        )
-        if config_A[0] == 0:
-            config_A = (None, config_A[1], config_A[2])
-        if config_B[0] == 0:
-            config_B = (None, config_B[1], config_B[2])
-        A = [{"role": "system", "content": setup_1}]
-        B = [{"role": "system", "content": setup_2}]
-        PDF = [{"role": f"system prompt for {name_A}:", "content": f"{setup_1}\n"},
-                {"role": f"config for {name_A}:", "content": f"Max tokens: {config_A[1]}\n Seed: {config_A[0]}"},
-                {"role": f"system prompt for {name_B}:", "content": f"{setup_2}\n"},
-                {"role": f"config for {name_B}:", "content": f"Max tokens: {config_B[1]}\n Seed: {config_B[0]}"}]
-        if self.flag_conversation_loaded:
-            A.extend(self.A_load)
-            B.extend(self.B_load)
-            PDF.extend(self.PDF_load)
+        config_A = parse_model_config(self.seed_A.text(), self.max_tokens_A.text(), self.color_A.text(), "#FF0000")
+        config_B = parse_model_config(self.seed_B.text(), self.max_tokens_B.text(), self.color_B.text(), "#0000FF")
+        entries = self.loaded_entries if self.flag_conversation_loaded else None
+        try:
+            participants = parse_participants({"participants": self.extra_participants})
+            transcript = new_transcript(setup_1, setup_2, name_A, name_B, config_A, config_B, entries, participants)
+        except ValueError as e:
+            QMessageBox.warning(self, self.lan_pack.get("participants_error_1"), f"{self.lan_pack.get('participants_error_2')}{e}")
+            return
+        # Participants without a model of their own use A's
+        extra_deployments = [p["model"] or model_1["deployment"] for p in participants]
         # Prepare arguments exactly as your original talk() expects
         talk_args = (
             self.language_select.currentText(),
             name,
             model_1["deployment"],
             model_2["deployment"],
-            A,
-            B,
-            PDF,
+            transcript,
             turns_int,
             self.referee.isChecked(),
             name_A,
@@ -315,15 +290,37 @@ class MainWindow(QWidget):
             config_B
         )
 
+        # Open the pooled API connection while the dialog is being built
+        try:
+            from conversation import warm_up
+            warm_up()
+        except Exception as e:
+            print(f"Error warming up connection: {e}")
+
+        # Every committed turn is appended to the session journal
+        try:
+            if self.resume_journal_path:
+                journal = Journal(self.resume_journal_path, self.collect_presets())
+            else:
+                journal = Journal(new_journal_path(name), self.collect_presets(), transcript.entries)
+        except Exception as e:
+            print(f"Error opening journal: {e}")
+            journal = None
+
         # Keep a reference so it doesn't get garbage collected
-        self.conv_dialog = ConversationDialog(talk_args=talk_args, parent=self)
+        self.conv_dialog = ConversationDialog(
+            talk_args=talk_args,
+            parent=self,
+            journal=journal,
+            extra_deployments=extra_deployments,
+            scheduler=self.scheduler_select.currentData(),
+            broadcast=self.broadcast.isChecked(),
+        )
         self.conv_dialog.setModal(True)   # optional: make it modal
         self.conv_dialog.show()
 
-    def save_presets(self):
-        # Save current settings to a JSON file.
-        file_name = self.file_name.text().strip()
-        presets = {
+    def collect_presets(self):
+        return {
             "name_A": self.name_A.text(),
             "name_B": self.name_B.text(),
             "sys_A": self.sys_edit.toPlainText(),
@@ -336,8 +333,18 @@ class MainWindow(QWidget):
             "color_B": self.color_B.text(),
             "turns": self.turns.text(),
             "referee": self.referee.isChecked(),
-            "file_name": file_name,
+            "file_name": self.file_name.text().strip(),
+            "model_A": (self.models_combo.currentData() or {}).get("deployment", ""),
+            "model_B": (self.models_combo_2.currentData() or {}).get("deployment", ""),
+            "scheduler": self.scheduler_select.currentData(),
+            "broadcast": self.broadcast.isChecked(),
+            "participants": self.extra_participants,
         }
+
+    def save_presets(self):
+        # Save current settings to a JSON file.
+        file_name = self.file_name.text().strip()
+        presets = self.collect_presets()
         # Ensure the subfolder 'presets' exists
         os.makedirs(Path(__file__).resolve().parent / "outputs" / "presets", exist_ok=True)
         # Construct the full path (add .json extension if missing)
@@ -350,6 +357,10 @@ class MainWindow(QWidget):
             self.status_label.setText(f"{self.lan_pack.get("preset_saved_status")} {file_path}")
         except Exception as e:
             print(f"Error saving preset: {e}")
+            return
+        # Imported here, sqlite3 isn't needed to show the window
+        from library import record
+        record(file_path, "presets")
 
     def load_presets(self):
         file_name, _ = QFileDialog.getOpenFileName(
@@ -360,66 +371,123 @@ class MainWindow(QWidget):
         )
         if not file_name:
             return  # User cancelled
+        self.load_presets_file(file_name)
+        return
+
+    def load_presets_file(self, file_name):
         self.status_label.setText(f"{self.lan_pack.get("preset_loading_status")} {file_name}...")
         with open(file_name, "r", encoding="utf-8") as f:
             presets = json.load(f)
-            self.name_A.setText(presets.get("name_A", ""))
-            self.name_B.setText(presets.get("name_B", ""))
-            self.sys_edit.setPlainText(presets.get("sys_A", ""))
-            self.sys_edit_2.setPlainText(presets.get("sys_B", ""))
-            self.seed_A.setText(presets.get("seed_A", ""))
-            self.max_tokens_A.setText(presets.get("max_tokens_A", ""))
-            self.color_A.setText(presets.get("color_A", ""))
-            self.seed_B.setText(presets.get("seed_B", ""))
-            self.max_tokens_B.setText(presets.get("max_tokens_B", ""))
-            self.color_B.setText(presets.get("color_B", ""))
-            self.turns.setText(presets.get("turns", ""))
-            self.referee.setChecked(presets.get("referee", False))
-            self.file_name.setText(presets.get("file_name", ""))
-        return
+        self.apply_presets(presets)
+
+    def apply_presets(self, presets):
+        self.name_A.setText(presets.get("name_A", ""))
+        self.name_B.setText(presets.get("name_B", ""))
+        self.sys_edit.setPlainText(presets.get("sys_A", ""))
+        self.sys_edit_2.setPlainText(presets.get("sys_B", ""))
+        self.seed_A.setText(presets.get("seed_A", ""))
+        self.max_tokens_A.setText(presets.get("max_tokens_A", ""))
+        self.color_A.setText(presets.get("color_A", ""))
+        self.seed_B.setText(presets.get("seed_B", ""))
+        self.max_tokens_B.setText(presets.get("max_tokens_B", ""))
+        self.color_B.setText(presets.get("color_B", ""))
+        self.turns.setText(presets.get("turns", ""))
+        self.referee.setChecked(presets.get("referee", False))
+        self.file_name.setText(presets.get("file_name", ""))
+        self.select_deployment(self.models_combo, presets.get("model_A", ""))
+        self.select_deployment(self.models_combo_2, presets.get("model_B", ""))
+        index = self.scheduler_select.findData(presets.get("scheduler") or "round_robin")
+        self.scheduler_select.setCurrentIndex(max(index, 0))
+        self.broadcast.setChecked(bool(presets.get("broadcast", False)))
+        self.extra_participants = list(presets.get("participants") or [])
+        if self.extra_participants:
+            self.status_label.setText(f"{self.lan_pack.get('extra_participants_status')} {len(self.extra_participants)}")
+
+    @staticmethod
+    def select_deployment(combo, deployment):
+        # Older presets don't store the models, keep the current selection then
+        for i in range(combo.count()):
+            if (combo.itemData(i) or {}).get("deployment") == deployment:
+                combo.setCurrentIndex(i)
+                return
 
     def load_conversation(self):
         file_name, _ = QFileDialog.getOpenFileName(
             self,
             "Open JSON File",         # Window title
             "outputs/Conversations_JSON/",                       # Starting directory ("" = current)
-            "JSON Files (*.json);;All Files (*)"  # File filter
+            "Conversations (*.json *.csa);;All Files (*)"  # File filter, JSON or archive.py archives
         )
         if not file_name:
             return  # User cancelled
-        self.status_label.setText(f"{self.lan_pack.get("conversation_loading_status")} {file_name}")
-        with open(file_name, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            for msg in data:
-                if msg["role"] == "A":
-                    temp_A = {"role": "assistant", "content": msg["content"]}
-                    self.A_load.append(temp_A)
-                    temp_B = {"role": "user", "content": msg["content"]}
-                    self.B_load.append(temp_B)
-                    self.PDF_load.append({"role": f"{self.name_A.text().strip()}:", "content": msg["content"]})
-                if msg["role"] == "B":
-                    temp_A = {"role": "user", "content": msg["content"]}
-                    self.A_load.append(temp_A)
-                    temp_B = {"role": "assistant", "content": msg["content"]}
-                    self.B_load.append(temp_B)
-                    self.PDF_load.append({"role": f"{self.name_B.text().strip()}:", "content": msg["content"]})
-            self.flag_conversation_loaded = True
-            self.status_label.setText(f"{self.lan_pack.get("conversation_loaded_status")} {file_name}")
+        self.load_conversation_file(file_name)
         return
+
+    def load_conversation_file(self, file_name):
+        self.status_label.setText(f"{self.lan_pack.get("conversation_loading_status")} {file_name}")
+        data = read_conversation(file_name)
+        self.loaded_entries.extend(entries_from_json(data))
+        self.flag_conversation_loaded = True
+        self.status_label.setText(f"{self.lan_pack.get("conversation_loaded_status")} {file_name}")
+
+    def open_library(self):
+        from library_window import LibraryDialog
+        try:
+            dialog = LibraryDialog(self.lan_pack, self)
+        except Exception as e:
+            QMessageBox.warning(self, self.lan_pack.get("library_error_1"), f"{self.lan_pack.get('library_error_2')}{e}")
+            return
+        dialog.exec()
+
+    def open_library_result(self, kind, file_name):
+        """Load a search result of the library like a file picked with Load Presets / Load Conversation."""
+        try:
+            if kind == "presets":
+                self.load_presets_file(file_name)
+            else:
+                self.load_conversation_file(file_name)
+        except Exception as e:
+            QMessageBox.warning(self, self.lan_pack.get("library_error_1"), f"{self.lan_pack.get('library_error_2')}{e}")
+            return False
+        return True
     
+    def resume_journal(self):
+        file_name, _ = QFileDialog.getOpenFileName(
+            self,
+            "Open Journal",
+            "outputs/Journals/",
+            "Journal Files (*.jsonl);;All Files (*)"
+        )
+        if not file_name:
+            return  # User cancelled
+        try:
+            config, entries, _ = read_journal(file_name)
+        except Exception as e:
+            QMessageBox.warning(self, self.lan_pack.get("journal_error_1"), f"{self.lan_pack.get('journal_error_2')}{e}")
+            return
+        # Rebuild the setup the session was started with, then continue from its last committed turn
+        self.apply_presets(config)
+        self.loaded_entries = entries
+        self.flag_conversation_loaded = True
+        self.status_label.setText(f"{self.lan_pack.get('journal_resumed_status')} {file_name}")
+        self.resume_journal_path = file_name
+        try:
+            self.on_start_clicked()
+        finally:
+            self.resume_journal_path = None
+
     def flush_conversation(self):
         self.flag_conversation_loaded = False
+        self.loaded_entries = []
         self.status_label.setText(self.lan_pack.get("conversation_flushed_status"))
         return
 
     def on_language_change(self):
         selected_language = self.language_select.currentText()
-        config_path = Path(__file__).resolve().parent / "language_packs" / selected_language
-        if not config_path.exists():
+        if not (LANGUAGE_DIR / selected_language).exists():
             QMessageBox.warning(self, self.lan_pack.get("language_pack_not_found_1"), f"{self.lan_pack.get("language_pack_not_found_2")}{selected_language}")
             return
-        with config_path.open("r", encoding="utf-8") as f:
-            self.lan_pack = json.load(f).get("main_window.py")
+        self.lan_pack = language_pack(selected_language, "main_window.py")
         # Update all UI text elements
         self.setWindowTitle(self.lan_pack.get("window_title"))
         self.sys_edit.setPlaceholderText(self.lan_pack.get("system_prompt_placeholder"))
@@ -432,15 +500,18 @@ class MainWindow(QWidget):
         self.color_B.setPlaceholderText(self.lan_pack.get("color_placeholder"))
         self.turns.setPlaceholderText(self.lan_pack.get("turns_placeholder"))
         self.referee.setText(self.lan_pack.get("referee_checkbox_text"))
+        for i, scheduler in enumerate(SCHEDULERS):
+            self.scheduler_select.setItemText(i, self.lan_pack.get(f"scheduler_{scheduler}"))
+        self.broadcast.setText(self.lan_pack.get("broadcast_checkbox_text"))
         self.start_btn.setText(self.lan_pack.get("start_button_text"))
         self.reload_btn.setText(self.lan_pack.get("reload_models_button_text"))
         self.save_presets_btn.setText(self.lan_pack.get("save_presets_button_text"))
         self.load_presets_btn.setText(self.lan_pack.get("load_presets_button_text"))
         self.load_conversation_btn.setText(self.lan_pack.get("load_conversation_button_text"))
         self.flush_conversation_btn.setText(self.lan_pack.get("flush_conversation_button_text"))
-        config_path = Path(__file__).resolve().parent / "config" / "setupModels.json"
-        with config_path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
+        self.resume_journal_btn.setText(self.lan_pack.get("resume_journal_button_text"))
+        self.library_btn.setText(self.lan_pack.get("library_button_text"))
+        # The loaded settings are shared, save a changed copy
+        data = dict(load_config())
         data["lan_pack"] = selected_language
-        with config_path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
\ No newline at end of file
+        save_config(data)
\ No newline at end of file
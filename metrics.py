@@ -0,0 +1,102 @@
+"""
+Latency and token usage of every API call of a session.
+
+Each line of the metrics file (JSONL) is one call:
+  {"time": epoch seconds, "kind": "A"|"B"|"referee"|"summary", "deployment": str,
+   "wall_ms": float, "first_token_ms": float|null, "streamed": bool,
+   "prompt_tokens": int|null, "completion_tokens": int|null, "cached_tokens": int|null,
+   "tokens_per_sec": float|null, "status": "ok"|"cancelled"|"error", "error": str (on errors)}
+
+Token counts are null when the backend didn't report usage. "cached_tokens" is the part of
+the prompt the server answered from its prompt cache, which shortens the time to first token. Replies served by the response
+cache are not API calls and are not recorded.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+METRICS_DIR = Path(__file__).resolve().parent / "outputs" / "Metrics"
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+
+def new_metrics_path(name):
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    return METRICS_DIR / f"{name or 'conversation'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+class CallMetrics:
+    """
+    Records API calls to the metrics file at `path` (or only in memory when `path` is None)
+    and keeps per-kind totals for summary().
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else None
+        self.lock = threading.Lock()
+        self.file = open(self.path, "a", encoding="utf-8") if self.path is not None else None
+        self.latencies = {}
+        self.first_tokens = {}
+        self.totals = {}
+
+    def record(self, kind, deployment, wall_seconds, usage=None, first_token_seconds=None, streamed=False, status="ok", error=None):
+        usage = usage or {}
+        completion = usage.get("completion_tokens")
+        # Generation speed, not counting the wait for the first token when it is known
+        generating = wall_seconds - (first_token_seconds or 0)
+        record = {
+            "time": time.time(),
+            "kind": kind,
+            "deployment": deployment,
+            "wall_ms": round(wall_seconds * 1000, 1),
+            "first_token_ms": round(first_token_seconds * 1000, 1) if first_token_seconds is not None else None,
+            "streamed": streamed,
+            **{field: usage.get(field) for field in TOKEN_FIELDS},
+            "tokens_per_sec": round(completion / generating, 1) if completion and generating > 0 else None,
+            "status": status,
+        }
+        if error is not None:
+            record["error"] = error
+        with self.lock:
+            if status == "ok":
+                self.latencies.setdefault(kind, []).append(wall_seconds)
+                if first_token_seconds is not None:
+                    self.first_tokens.setdefault(kind, []).append(first_token_seconds)
+            totals = self.totals.setdefault(kind, {"calls": 0, **{field: 0 for field in TOKEN_FIELDS}})
+            totals["calls"] += 1
+            for field in TOKEN_FIELDS:
+                totals[field] += usage.get(field) or 0
+            if self.file is not None:
+                self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self.file.flush()
+
+    def summary(self):
+        """
+        Return {kind: {"calls", "p50", "p95" (seconds, None without successful calls),
+        "first_token_p50" (seconds, None without streamed calls), token totals}}.
+        """
+        with self.lock:
+            return {
+                kind: {
+                    **totals,
+                    "p50": percentile(self.latencies.get(kind, []), 50),
+                    "p95": percentile(self.latencies.get(kind, []), 95),
+                    "first_token_p50": percentile(self.first_tokens.get(kind, []), 50),
+                }
+                for kind, totals in self.totals.items()
+            }
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,150 @@
+"""
+Bulk PDF export of saved conversations, without the GUI.
+
+Usage:
+  python pdf_batch.py                                          # everything in outputs/Conversations_JSON
+  python pdf_batch.py "outputs/Conversations_JSON/night_*.json" --workers 8
+  python pdf_batch.py old_runs/ --output-dir old_runs/pdf --force
+
+Every <name>.json (or <name>.csa archive, see archive.py) becomes <name>.pdf in the output directory
+(<name>_csa.pdf when both exist, see pdf_names), rendered in a pool of processes
+(one per core by default). The hash of each exported file is kept in the output directory, so
+running it again only renders the conversations that changed since. Saved conversations only
+store the speakers' letters, so the PDFs name them A, B, C...
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from PDFer import export_conversation_to_pdf
+from archive import read_conversation
+
+BASE_DIR = Path(__file__).resolve().parent
+JSON_DIR = BASE_DIR / "outputs" / "Conversations_JSON"
+PDF_DIR = BASE_DIR / "outputs" / "Conversations_PDF"
+# Source hashes of the PDFs of an output directory, by PDF name
+HASHES_FILE = ".export_hashes.json"
+# Part of every hash: bump it when the PDF layout changes so everything is rendered again
+LAYOUT_VERSION = 2
+
+def expand_inputs(patterns):
+    """Conversation files of directories (their *.json and *.csa archives) and glob patterns, each file once."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            # The JSON files first, so they keep the plain PDF names when an archive has the same name
+            matches = sorted(glob.glob(os.path.join(pattern, "*.json"))) + sorted(glob.glob(os.path.join(pattern, "*.csa")))
+        else:
+            matches = sorted(glob.glob(pattern)) or [pattern]
+        paths.extend(matches)
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+def pdf_names(paths):
+    """
+    PDF name of each file of `paths`: <name>.pdf, and for a later file with the same name (e.g.
+    night.json and night.csa, or two directories) <name>_<extension>.pdf, then a counter.
+    """
+    names, used = [], set()
+    for path in paths:
+        stem, extension = Path(path).stem, Path(path).suffix.lstrip(".").lower()
+        candidates = [stem, f"{stem}_{extension}"] if extension else [stem]
+        name = next((candidate for candidate in candidates if candidate.lower() not in used), None)
+        counter = 1
+        while name is None or name.lower() in used:
+            counter += 1
+            name = f"{candidates[-1]}_{counter}"
+        used.add(name.lower())
+        names.append(name + ".pdf")
+    return names
+
+def content_hash(path):
+    digest = hashlib.sha256(f"layout {LAYOUT_VERSION}\n".encode("utf-8"))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_hashes(output_dir):
+    try:
+        with open(os.path.join(output_dir, HASHES_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_hashes(output_dir, hashes):
+    path = os.path.join(output_dir, HASHES_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(hashes, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def render(path, output_dir, name):
+    """Export the conversation at `path` as `name`; runs in a worker process. Returns (messages, PDF bytes)."""
+    data = read_conversation(path)
+    messages = ({"role": f"{msg['role']}:", "content": msg["content"]} for msg in data)
+    pdf_path = export_conversation_to_pdf(messages, output_dir=output_dir, name=Path(name).stem)
+    return len(data), os.path.getsize(pdf_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export saved ConvoSimul conversations to PDF in parallel.")
+    parser.add_argument("inputs", nargs="*", default=[str(JSON_DIR)], help="Conversation files, directories or glob patterns (default: outputs/Conversations_JSON)")
+    parser.add_argument("--output-dir", default=str(PDF_DIR), help="Where the PDFs are written (default: outputs/Conversations_PDF)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes rendering at the same time (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="Render every file, even the ones whose PDF is up to date")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    hashes = load_hashes(args.output_dir)
+    paths = expand_inputs(args.inputs)
+    started = time.perf_counter()
+    pending = {}
+    skipped = 0
+    for path, name in zip(paths, pdf_names(paths)):
+        if not os.path.isfile(path):
+            print(f"[failed] {path}: no such file")
+            continue
+        digest = content_hash(path)
+        if not args.force and hashes.get(name) == digest and os.path.exists(os.path.join(args.output_dir, name)):
+            skipped += 1
+            continue
+        pending[path] = (name, digest)
+
+    exported = messages = pdf_bytes = 0
+    failures = len(paths) - skipped - len(pending)
+    workers = max(1, min(args.workers, len(pending)))
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(render, path, args.output_dir, pending[path][0]): path for path in pending}
+            try:
+                for future in as_completed(futures):
+                    path = futures[future]
+                    name, digest = pending[path]
+                    try:
+                        count, size = future.result()
+                    except Exception as e:
+                        failures += 1
+                        hashes.pop(name, None)
+                        print(f"[failed] {path}: {e}")
+                        continue
+                    exported += 1
+                    messages += count
+                    pdf_bytes += size
+                    hashes[name] = digest
+                    print(f"[ok] {path} -> {name}: {count} messages")
+            finally:
+                # Keep what was exported even if interrupted
+                save_hashes(args.output_dir, hashes)
+    elapsed = time.perf_counter() - started
+
+    print(f"{exported} exported, {skipped} up to date, {failures} failed, in {elapsed:.1f}s with {workers} workers")
+    if exported:
+        print(f"Throughput: {exported / elapsed:.1f} files/s, {messages / elapsed:.0f} messages/s, {pdf_bytes / elapsed / 1e6:.1f} MB/s of PDF")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,56 @@
+"""
+Qt-free helpers that turn presets and saved conversations into a Transcript.
+"""
+
+import re
+from transcript import Transcript, SPEAKERS
+
+# Colors of the participants after A and B that don't set their own
+EXTRA_COLORS = ("#008000", "#800080", "#FF8C00", "#008B8B", "#8B4513", "#FF1493")
+SCHEDULERS = ("round_robin", "random", "moderator")
+
+def is_hex_color(s: str) -> bool:
+    return bool(re.fullmatch(r"#([0-9A-Fa-f]{3}|[0-9A-Fa-f]{6})", s))
+
+def parse_model_config(seed, max_tokens, color, default_color):
+    """Return (seed, max_tokens, color) from the raw text fields, applying the UI defaults."""
+    config = (
+        int(seed if seed.strip().isdigit() else 0),
+        int(max_tokens if max_tokens.strip().isdigit() else 1000),
+        color.strip() if is_hex_color(color.strip()) else default_color,
+    )
+    if config[0] == 0:
+        config = (None, config[1], config[2])
+    return config
+
+def parse_participants(presets):
+    """
+    Return the participants after A and B, listed in presets under "participants" as
+    {"name", "sys", "model", "seed", "max_tokens", "color"}, as dicts with "name", "sys",
+    "model" (deployment, may be empty) and "config" (seed, max_tokens, color).
+    """
+    participants = []
+    for i, raw in enumerate(presets.get("participants") or []):
+        sys_prompt = str(raw.get("sys", "")).strip()
+        if not sys_prompt:
+            raise ValueError(f"Participant {SPEAKERS[i + 2]} is missing a system prompt")
+        participants.append({
+            "name": str(raw.get("name", "")).strip(),
+            "sys": sys_prompt,
+            "model": str(raw.get("model", "")).strip(),
+            "config": parse_model_config(str(raw.get("seed", "")), str(raw.get("max_tokens", "")), str(raw.get("color", "")), EXTRA_COLORS[i % len(EXTRA_COLORS)]),
+        })
+    return participants
+
+def new_transcript(setup_1, setup_2, name_A, name_B, config_A, config_B, entries=None, participants=()):
+    """
+    Return the Transcript of a new conversation, optionally starting from loaded `entries`.
+
+    `participants` are the ones after A and B, as returned by parse_participants.
+    """
+    system_prompts = [setup_1, setup_2] + [p["sys"] for p in participants]
+    if entries and max(entry.speaker for entry in entries) >= len(system_prompts):
+        raise ValueError(f"The loaded conversation has more than {len(system_prompts)} participants")
+    names = [name_A, name_B] + [p["name"] for p in participants]
+    configs = [config_A, config_B] + [p["config"] for p in participants]
+    return Transcript(system_prompts, names, configs, entries)
@@ -0,0 +1,119 @@
+"""
+Client-side rate limiting and retry backoff for the API deployments.
+
+Limits come from the "models" entries of setupModels.json ("rpm" requests and "tpm" tokens
+per minute); see conversation.get_rate_limiter(). Requests over the limit wait their turn
+instead of being sent and rejected with a 429.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+# Waiting requests check for cancellation this often
+POLL_SECONDS = 0.1
+
+class TokenBucket:
+    """
+    Refills at `headroom` of `per_minute` / 60 units per second, holding at most
+    `burst_seconds` worth.
+
+    Azure enforces quotas over 1 and 10 second windows, so a full minute's worth must never go
+    out at once: with the defaults any 10 second window gets at most 99% of its share.
+    """
+
+    def __init__(self, per_minute, burst_seconds=1, headroom=0.9):
+        self.rate = per_minute / 60 * headroom
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` can be taken (a request bigger than the bucket waits for a full one)."""
+        self._refill(now)
+        need = min(amount, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+    def take(self, amount, now):
+        # Always charged in full: a request bigger than the bucket leaves it in debt, which the
+        # next requests wait out, so the rate holds whatever the request sizes
+        self._refill(now)
+        self.level -= amount
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits of one deployment, shared by every
+    conversation using it. Requests are let through in arrival order.
+    """
+
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.condition = threading.Condition()
+        self.queue = deque()
+        self.paused_until = 0.0
+
+    def acquire(self, tokens, cancel_event=None):
+        """Wait until a request of about `tokens` tokens fits the limits; return False if cancelled first."""
+        ticket = object()
+        with self.condition:
+            self.queue.append(ticket)
+            try:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        return False
+                    now = time.monotonic()
+                    wait = POLL_SECONDS
+                    if self.queue[0] is ticket:
+                        wait = max(
+                            self.paused_until - now,
+                            self.requests.wait_time(1, now) if self.requests else 0.0,
+                            self.tokens.wait_time(tokens, now) if self.tokens else 0.0,
+                        )
+                        if wait <= 0:
+                            if self.requests:
+                                self.requests.take(1, now)
+                            if self.tokens:
+                                self.tokens.take(tokens, now)
+                            return True
+                    self.condition.wait(min(wait, POLL_SECONDS))
+            finally:
+                self.queue.remove(ticket)
+                self.condition.notify_all()
+
+    def try_acquire(self, tokens):
+        """
+        Let a request of about `tokens` tokens through if it fits the limits right now and no
+        request is waiting; return whether it did. Never waits nor goes ahead of the queue.
+        """
+        with self.condition:
+            now = time.monotonic()
+            if self.queue or now < self.paused_until:
+                return False
+            if (self.requests and self.requests.wait_time(1, now) > 0) or (self.tokens and self.tokens.wait_time(tokens, now) > 0):
+                return False
+            if self.requests:
+                self.requests.take(1, now)
+            if self.tokens:
+                self.tokens.take(tokens, now)
+            return True
+
+    def pause(self, seconds):
+        """Hold every request to this deployment for `seconds` (after a 429)."""
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+def backoff_delay(attempt, base_delay, max_delay, retry_after=None):
+    """
+    Seconds to wait before retry number `attempt` (0-based): exponential backoff with full
+    jitter, or the server's Retry-After plus a little jitter so waiting clients don't all
+    come back at once.
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, base_delay)
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
@@ -0,0 +1,147 @@
+"""
+Tiered referee: decides whether a new message keeps the context of the conversation.
+
+1. A lexical similarity score of the message against the system prompts and the recent turns
+   settles the clear-cut cases locally, without an API call (needs NumPy, skipped without it).
+2. The ambiguous ones are asked to a model, the "deployment" of the "referee" section of
+   setupModels.json (A's by default; a small, cheap one is enough), which answers in one token.
+3. With "every_k_turns" above 1 the messages are checked K at a time in one call.
+"""
+
+import re
+import threading
+import zlib
+from conversation import talk
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+REFEREE_SYSTEM_PROMPT = "Your'e a context checker, your response will be used in a program so strictly reply just yes or no"
+BATCH_SYSTEM_PROMPT = "Your'e a context checker, your response will be used in a program so strictly reply just a number"
+CONTEXT_CHECK_PROMPT = "Given the following conversation and system prompts reply with just yes or no, if the last message is still keeping the same context (some messages might be missing, just consider if the new message is a possible continuation of this context), context:\n"
+BATCH_QUESTION = "Reply with just the number of the first new message that is not keeping the same context, or 0 if they all are."
+
+# Words are hashed into this many buckets, so no vocabulary has to be built
+VECTOR_SIZE = 4096
+# Shorter words are mostly function words and say little about the topic
+WORD = re.compile(r"\w{4,}")
+
+def build_context_check(PDF):
+    context_check = CONTEXT_CHECK_PROMPT
+    for msg in PDF:
+        context_check += msg["role"] + ": " + msg["content"] + "\n"
+    return context_check
+
+def referee_request(context_check, result):
+    """
+    Messages asking the referee about `result`. Everything before the new message is the same
+    for every check, so the server can reuse its prompt cache for it.
+    """
+    return [
+        {"role": "system", "content": REFEREE_SYSTEM_PROMPT},
+        {"role": "user", "content": context_check},
+        {"role": "user", "content": "New message: \n" + result + "\n reply with just yes or no."},
+    ]
+
+def batch_request(context_check, results):
+    """Messages asking the referee for the first of `results` that leaves the context."""
+    numbered = "".join(f"{i + 1}: {result}\n" for i, result in enumerate(results))
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": context_check},
+        {"role": "user", "content": "New messages: \n" + numbered + BATCH_QUESTION},
+    ]
+
+def lexical_vector(text):
+    """Unit-length vector of the log counts of the words of `text`."""
+    words = WORD.findall(text.lower())
+    if not words:
+        return np.zeros(VECTOR_SIZE, dtype=np.float32)
+    buckets = np.fromiter((zlib.crc32(word.encode("utf-8")) % VECTOR_SIZE for word in words), dtype=np.int64, count=len(words))
+    vector = np.log1p(np.bincount(buckets, minlength=VECTOR_SIZE).astype(np.float32))
+    return vector / np.linalg.norm(vector)
+
+def lexical_similarity(text, references):
+    """Highest cosine similarity between `text` and the (unit) row vectors of `references`."""
+    return float(np.max(references @ lexical_vector(text)))
+
+class Referee:
+    """
+    Checks committed messages with the settings of the "referee" section of setupModels.json:
+    "deployment", "prefilter", "accept_above", "reject_below", "min_words", "recent_turns",
+    "every_k_turns" and "answer_max_tokens".
+    """
+
+    def __init__(self, settings, system_prompts, default_deployment):
+        self.deployment = settings.get("deployment") or default_deployment
+        self.prefilter = bool(settings.get("prefilter", True)) and np is not None
+        self.accept_above = float(settings.get("accept_above", 0.25))
+        self.reject_below = float(settings.get("reject_below", 0.02))
+        self.min_words = int(settings.get("min_words", 12))
+        self.recent_turns = int(settings.get("recent_turns", 6))
+        self.every_k_turns = max(1, int(settings.get("every_k_turns", 1)))
+        self.answer_max_tokens = int(settings.get("answer_max_tokens", 1))
+        # The system prompts never change, their vectors are computed once
+        self.prompt_vectors = np.stack([lexical_vector(prompt) for prompt in system_prompts]) if self.prefilter else None
+        self.lock = threading.Lock()
+        self.local_decisions = 0
+        self.model_decisions = 0
+
+    def score(self, entries, index):
+        """Lexical similarity of message `index` of `entries` to the system prompts and the turns before it."""
+        recent = " ".join(entry.content for entry in entries[max(0, index - self.recent_turns):index])
+        references = np.vstack([self.prompt_vectors, lexical_vector(recent)[None, :]])
+        return lexical_similarity(entries[index].content, references)
+
+    def local_verdict(self, entries, index):
+        """True/False when the score is clear-cut, None when a model has to decide."""
+        if not self.prefilter:
+            return None
+        score = self.score(entries, index)
+        if score >= self.accept_above:
+            return True
+        # Short replies ("Exactly!") share few words with anything: only long ones are rejected here
+        if score < self.reject_below and len(WORD.findall(entries[index].content)) >= self.min_words:
+            return False
+        return None
+
+    def check(self, transcript, indexes, context_check, cancel_event=None, metrics=None):
+        """
+        Check the committed messages at `indexes` (in order); return [(index, in_context)] up to
+        and including the first one out of context.
+        """
+        entries = list(transcript.entries)
+        # Messages after the first one rejected locally don't need checking
+        decided = {}
+        for index in indexes:
+            decided[index] = self.local_verdict(entries, index)
+            if decided[index] is False:
+                break
+        ambiguous = [index for index, verdict in decided.items() if verdict is None]
+        with self.lock:
+            self.local_decisions += len(decided) - len(ambiguous)
+        failed = self.ask(entries, ambiguous, context_check, cancel_event, metrics) if ambiguous else None
+        verdicts = []
+        for index, verdict in decided.items():
+            in_context = index != failed if verdict is None else verdict
+            verdicts.append((index, in_context))
+            if not in_context:
+                break
+        return verdicts
+
+    def ask(self, entries, indexes, context_check, cancel_event=None, metrics=None):
+        """Ask the model about the messages at `indexes`; return the index of the first out of context, or None."""
+        with self.lock:
+            self.model_decisions += len(indexes)
+        results = [entries[index].content for index in indexes]
+        if len(results) == 1:
+            answer = talk(msgs=referee_request(context_check, results[0]), dep=self.deployment, seed=None, max_tokens=self.answer_max_tokens, cancel_event=cancel_event, kind="referee", metrics=metrics)
+            # Only the first word counts, so "not sure" or "I know" aren't taken for a no
+            return indexes[0] if re.match(r"\W*no\b", (answer or "").lower()) else None
+        # Numbers up to a few hundred are one token as well
+        answer = talk(msgs=batch_request(context_check, results), dep=self.deployment, seed=None, max_tokens=self.answer_max_tokens, cancel_event=cancel_event, kind="referee", metrics=metrics)
+        number = re.search(r"\d+", answer or "")
+        first = int(number.group()) if number else 0
+        return indexes[first - 1] if 1 <= first <= len(indexes) else None
@@ -0,0 +1,88 @@
+"""
+On-disk cache of chat completions, keyed on everything that determines a request.
+
+Enabled with the "cache" section of setupModels.json; see conversation.get_response_cache().
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class ResponseCache:
+    """
+    SQLite-backed LRU cache of reply texts.
+
+    Entries older than `max_age_days` are dropped, and beyond `max_entries` the least
+    recently used ones go first. `hits` and `misses` count lookups since the cache was opened.
+    """
+
+    def __init__(self, path, max_entries=5000, max_age_days=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared by the GUI worker, referee and batch threads, guarded by self.lock
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        self.db.commit()
+
+    @staticmethod
+    def make_key(dep, msgs, seed, max_tokens):
+        request = {"deployment": dep, "messages": list(msgs), "seed": seed, "max_tokens": max_tokens}
+        blob = json.dumps(request, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or self._expired(row[1], now):
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, content):
+        with self.lock:
+            now = time.time()
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, content, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            )
+            self._evict(now)
+            self.db.commit()
+
+    def _expired(self, created, now):
+        return self.max_age_days is not None and created < now - self.max_age_days * 86400
+
+    def _evict(self, now):
+        if self.max_age_days is not None:
+            self.db.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age_days * 86400,))
+        if self.max_entries:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,254 @@
+"""
+Routing of a model's requests across several endpoints or deployments.
+
+A model of setupModels.json can list "routes", each an endpoint (with its own "key",
+"api_version", "base_url" or "backend", the top-level ones by default), a "deployment" (the
+model's by default) and a "weight":
+
+  {"deployment": "gpt-4o", "model_name": "GPT-4o", "routes": [
+      {"endpoint": "https://east.openai.azure.com", "key": "...", "weight": 2},
+      {"endpoint": "https://west.openai.azure.com", "key": "...", "deployment": "gpt-4o-west"}]}
+
+Each request goes to the healthy route with the fewest requests in flight for its weight, ties
+broken at random in proportion to the weights, so sequential traffic is split by weight too. A
+route failing "failure_threshold" times in a row with a retryable error (429, 5xx, timeouts)
+is skipped for "cooldown_seconds", and a failed request is sent again to the next route, once
+the deployment's rate limits let it through. With
+"hedge" on, a request still unanswered after its route's 95th percentile latency is also sent to
+a second route and the first answer wins, if the deployment's rate limits have room for it
+right away. Settings are in the "routing" section.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from backends import backend_from_settings, is_retryable, close_stream, TalkCancelled
+from history import estimate_tokens
+from metrics import percentile
+
+# Keys of a route that configure its backend, the top-level ones of setupModels.json by default
+BACKEND_KEYS = ("backend", "endpoint", "key", "api_version", "base_url", "stream_usage", "prompt_cache_key")
+# Latencies kept per route and max_tokens: a one-token referee answer and a full turn don't
+# share a percentile
+LATENCY_SAMPLES = 200
+# Backup requests of hedging run here, the primary one on the caller's thread
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+def _acquire_failover(limiter, msgs, max_tokens, cancel_event):
+    # The caller acquired the first route's request: each one sent to another route counts too
+    if limiter is not None and not limiter.acquire(estimate_tokens(msgs) + (max_tokens or 0), cancel_event):
+        raise TalkCancelled()
+
+class Route:
+    """One endpoint and deployment a model can be reached at, with its load and health."""
+
+    def __init__(self, backend, deployment, weight, name):
+        self.backend = backend
+        self.deployment = deployment
+        self.weight = weight
+        self.name = name
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.latencies = {}
+
+    def healthy(self, now):
+        return now >= self.unhealthy_until
+
+class Router:
+    """Sends the requests of one model to its routes, see the module docstring."""
+
+    def __init__(self, routes, settings=None):
+        settings = settings or {}
+        self.routes = routes
+        self.failure_threshold = int(settings.get("failure_threshold", 3))
+        self.cooldown_seconds = float(settings.get("cooldown_seconds", 30))
+        self.hedge = bool(settings.get("hedge", False))
+        self.hedge_percentile = float(settings.get("hedge_percentile", 0.95))
+        # Below this many answers the percentile isn't trusted and no backup is sent
+        self.hedge_min_samples = int(settings.get("hedge_min_samples", 20))
+        self.lock = threading.Lock()
+        self.hedges = 0
+        self.hedges_won = 0
+
+    def pick(self, exclude=()):
+        """
+        The route for the next request: least outstanding for its weight among the healthy ones,
+        ties broken at random in proportion to the weights.
+        """
+        with self.lock:
+            now = time.monotonic()
+            candidates = [route for route in self.routes if route not in exclude]
+            if not candidates:
+                return None
+            healthy = [route for route in candidates if route.healthy(now)]
+            if not healthy:
+                # Everything is cooling down: try the one that has rested the longest
+                return min(candidates, key=lambda route: route.unhealthy_until)
+            lowest = min(route.outstanding / route.weight for route in healthy)
+            least_loaded = [route for route in healthy if route.outstanding / route.weight == lowest]
+            return random.choices(least_loaded, weights=[route.weight for route in least_loaded])[0]
+
+    def begin(self, route):
+        with self.lock:
+            route.outstanding += 1
+            route.requests += 1
+
+    def end(self, route, max_tokens, seconds, error=None):
+        with self.lock:
+            route.outstanding -= 1
+            if error is None:
+                route.consecutive_failures = 0
+                route.unhealthy_until = 0.0
+                route.latencies.setdefault(max_tokens, deque(maxlen=LATENCY_SAMPLES)).append(seconds)
+            elif is_retryable(error):
+                route.failures += 1
+                route.consecutive_failures += 1
+                if route.consecutive_failures >= self.failure_threshold:
+                    route.unhealthy_until = time.monotonic() + self.cooldown_seconds
+
+    def hedge_delay(self, route, max_tokens):
+        """Seconds after which a backup request is sent, or None when hedging doesn't apply."""
+        if not self.hedge or len(self.routes) < 2:
+            return None
+        with self.lock:
+            samples = list(route.latencies.get(max_tokens, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return percentile(samples, self.hedge_percentile * 100)
+
+    def _call(self, route, msgs, seed, max_tokens, cancel_event=None):
+        self.begin(route)
+        start = time.perf_counter()
+        try:
+            result = route.backend.complete(msgs, route.deployment, seed, max_tokens, cancel_event)
+        except Exception as e:
+            self.end(route, max_tokens, time.perf_counter() - start, e)
+            raise
+        self.end(route, max_tokens, time.perf_counter() - start)
+        return result
+
+    def complete(self, msgs, seed, max_tokens, cancel_event=None, limiter=None):
+        """
+        Like Backend.complete, on the best route; a retryable failure moves on to the next route
+        and is raised once every route failed. `limiter`, the deployment's RateLimiter if it has
+        one, is acquired before each failover request; a hedge's backup request is only sent when
+        it lets it through without waiting.
+        """
+        tried = []
+        while True:
+            if tried:
+                _acquire_failover(limiter, msgs, max_tokens, cancel_event)
+            route = self.pick(exclude=tried)
+            tried.append(route)
+            try:
+                return self._hedged(route, tried, msgs, seed, max_tokens, cancel_event, limiter)
+            except Exception as e:
+                if not is_retryable(e) or len(tried) == len(self.routes):
+                    raise
+
+    def _hedged(self, route, tried, msgs, seed, max_tokens, cancel_event, limiter):
+        delay = self.hedge_delay(route, max_tokens)
+        if delay is None:
+            return self._call(route, msgs, seed, max_tokens, cancel_event)
+        primary = _hedge_pool.submit(self._call, route, msgs, seed, max_tokens, cancel_event)
+        done, _ = wait([primary], timeout=delay)
+        backup_route = self.pick(exclude=tried) if not done and not (cancel_event is not None and cancel_event.is_set()) else None
+        # The backup is a request of its own against the quota; with none to spare it isn't sent
+        if backup_route is None or (limiter is not None and not limiter.try_acquire(estimate_tokens(msgs) + (max_tokens or 0))):
+            return primary.result()
+        tried.append(backup_route)
+        with self.lock:
+            self.hedges += 1
+        backup = _hedge_pool.submit(self._call, backup_route, msgs, seed, max_tokens, cancel_event)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower request finishes in the background and is only counted
+                    if future is backup:
+                        with self.lock:
+                            self.hedges_won += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stream(self, msgs, seed, max_tokens, cancel_event=None, limiter=None):
+        """
+        Like Backend.stream on the best route, moving on to the next route when opening the
+        stream fails, after acquiring `limiter` like complete(). Streams aren't hedged: the first
+        tokens arrive long before the p95.
+        """
+        tried = []
+        while True:
+            if tried:
+                _acquire_failover(limiter, msgs, max_tokens, cancel_event)
+            route = self.pick(exclude=tried)
+            tried.append(route)
+            self.begin(route)
+            start = time.perf_counter()
+            try:
+                stream = route.backend.stream(msgs, route.deployment, seed, max_tokens)
+            except Exception as e:
+                self.end(route, max_tokens, time.perf_counter() - start, e)
+                if not is_retryable(e) or len(tried) == len(self.routes):
+                    raise
+                continue
+            return RoutedStream(stream, lambda error=None: self.end(route, max_tokens, time.perf_counter() - start, error))
+
+    def stats(self):
+        """Per route: requests, failures, in flight and whether it's cooling down; and the hedges sent and won."""
+        with self.lock:
+            now = time.monotonic()
+            routes = [
+                {"route": route.name, "requests": route.requests, "failures": route.failures,
+                 "outstanding": route.outstanding, "healthy": route.healthy(now)}
+                for route in self.routes
+            ]
+            return {"routes": routes, "hedges": self.hedges, "hedges_won": self.hedges_won}
+
+class RoutedStream:
+    """An SDK stream that reports to its route when it's closed."""
+
+    def __init__(self, stream, on_close):
+        self.stream = stream
+        self.on_close = on_close
+
+    def __enter__(self):
+        self.stream.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            return self.stream.__exit__(exc_type, exc, tb)
+        finally:
+            self.on_close(exc if isinstance(exc, Exception) else None)
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def close(self):
+        close_stream(self.stream)
+
+def router_from_settings(settings, model):
+    """The Router of a "models" entry of setupModels.json, or None when it has no "routes"."""
+    raw_routes = model.get("routes") or []
+    if not raw_routes:
+        return None
+    defaults = {key: settings[key] for key in BACKEND_KEYS if key in settings}
+    routes = []
+    for i, raw in enumerate(raw_routes):
+        backend = backend_from_settings({**defaults, **{key: raw[key] for key in BACKEND_KEYS if key in raw}})
+        deployment = raw.get("deployment") or model["deployment"]
+        name = raw.get("name") or f"{raw.get('endpoint') or raw.get('base_url') or 'default'}/{deployment}"
+        weight = float(raw.get("weight", 1))
+        if weight <= 0:
+            raise ValueError(f"Route {i + 1} of {model['deployment']} needs a positive weight")
+        routes.append(Route(backend, deployment, weight, name))
+    return Router(routes, settings.get("routing") or {})
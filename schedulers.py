@@ -0,0 +1,76 @@
+"""
+Turn schedulers: who speaks next in a conversation with two or more participants.
+
+Every scheduler has next_speaker(engine, cancel_event=None) returning a participant index.
+"""
+
+import random
+import re
+from conversation import talk
+
+MODERATOR_SYSTEM_PROMPT = "You moderate a conversation between several participants, your response will be used in a program so strictly reply with just the name of a participant"
+MODERATOR_PROMPT = "Participants: {participants}\nConversation so far:\n{conversation}"
+MODERATOR_QUESTION = "Who should speak next, other than {last}? Reply with just their name."
+# The moderator only sees the end of the conversation: the window moves this many messages at a
+# time, so its start stays put (and the prompt cache keeps matching) for that many turns
+MODERATOR_CONTEXT_MESSAGES = 20
+
+class RoundRobinScheduler:
+    """Participants speak in order: A, B, C, A, B, C..."""
+
+    def next_speaker(self, engine, cancel_event=None):
+        return len(engine.transcript) % engine.participants
+
+class RandomScheduler:
+    """A random participant speaks next, never the one who just spoke."""
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def next_speaker(self, engine, cancel_event=None):
+        choices = list(range(engine.participants))
+        if engine.transcript.entries and len(choices) > 1:
+            choices.remove(engine.transcript.entries[-1].speaker)
+        return self.random.choice(choices)
+
+class ModeratorScheduler:
+    """
+    A model (`deployment`, by default A's) reads the end of the conversation and picks who
+    speaks next, never the one who just spoke. Falls back to the participant after the last
+    speaker when its answer names nobody else.
+    """
+
+    def __init__(self, deployment=None):
+        self.deployment = deployment
+
+    def next_speaker(self, engine, cancel_event=None):
+        transcript = engine.transcript
+        if not transcript.entries:
+            return 0
+        labels = [transcript.label(i) for i in range(engine.participants)]
+        last = transcript.entries[-1].speaker
+        start = max(0, (len(transcript) // MODERATOR_CONTEXT_MESSAGES - 1) * MODERATOR_CONTEXT_MESSAGES)
+        conversation = "".join(f"{transcript.label(entry.speaker)}: {entry.content}\n" for entry in transcript.entries[start:])
+        msgs = [
+            {"role": "system", "content": MODERATOR_SYSTEM_PROMPT},
+            {"role": "user", "content": MODERATOR_PROMPT.format(participants=", ".join(labels), conversation=conversation)},
+            {"role": "user", "content": MODERATOR_QUESTION.format(last=labels[last])},
+        ]
+        answer = talk(msgs=msgs, dep=self.deployment or engine.deployments[0], seed=None, max_tokens=20, cancel_event=cancel_event, kind="moderator", metrics=engine.metrics)
+        answer = (answer or "").strip().lower()
+        # Longest names first, so "Anna" doesn't win over "Anna Maria"
+        candidates = [i for i in range(len(labels)) if i != last]
+        for speaker in sorted(candidates, key=lambda i: -len(labels[i])):
+            if re.search(rf"\b{re.escape(labels[speaker].lower())}\b", answer):
+                return speaker
+        return (last + 1) % engine.participants
+
+def make_scheduler(name, seed=None, moderator_deployment=None):
+    """Return the scheduler called `name` ("round_robin", "random" or "moderator")."""
+    if name == "random":
+        return RandomScheduler(seed)
+    if name == "moderator":
+        return ModeratorScheduler(moderator_deployment)
+    if name in (None, "", "round_robin"):
+        return RoundRobinScheduler()
+    raise ValueError(f"Unknown scheduler {name!r}, expected round_robin, random or moderator")
@@ -0,0 +1,62 @@
+"""
+Settings and language packs, read once and kept until the file changes on disk.
+
+Every window and module asks here instead of opening setupModels.json or a language pack
+itself; a file is parsed again only when its modification time or size changed.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+CONFIG_PATH = BASE_DIR / "config" / "setupModels.json"
+LANGUAGE_DIR = BASE_DIR / "language_packs"
+
+# Parsed JSON per path, with the (mtime, size) it was read at
+_cache = {}
+_lock = threading.Lock()
+
+def read_json(path):
+    """
+    Return the parsed JSON at `path`, re-reading it only when the file changed. The result is
+    shared between callers: copy it before modifying it.
+    """
+    path = str(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        _cache[path] = (stamp, data)
+        return data
+
+def load_config():
+    """Return setupModels.json as a dict ({} when it's missing)."""
+    if not CONFIG_PATH.exists():
+        return {}
+    return read_json(CONFIG_PATH)
+
+def save_config(data):
+    with CONFIG_PATH.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+def languages():
+    """File names of the available language packs."""
+    return os.listdir(LANGUAGE_DIR)
+
+def language_pack(language=None, section=None):
+    """
+    Return the language pack `language` (by default the "lan_pack" of setupModels.json, the
+    first pack when it doesn't exist), or only its `section` (e.g. "main_window.py").
+    """
+    language = language or load_config().get("lan_pack")
+    path = LANGUAGE_DIR / language if language else None
+    if path is None or not path.exists():
+        path = LANGUAGE_DIR / languages()[0]
+    pack = read_json(path)
+    return pack.get(section) or {} if section is not None else pack
@@ -0,0 +1,77 @@
+"""
+Startup report: where the time to the first window goes.
+
+Usage:
+  python startup_report.py             # slowest imports of main_window, time to first window
+  python startup_report.py --top 40
+
+Imports are timed with Python's -X importtime in a fresh interpreter. The time to first window
+runs main.py's startup (imports, QApplication, MainWindow, first paint) in another fresh
+interpreter and lists the heavy modules that were already loaded by then; openai, reportlab
+and numpy should only appear once a conversation starts or a PDF is exported.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+# Modules the first window doesn't need
+HEAVY_MODULES = ("openai", "httpx", "reportlab", "numpy", "sqlite3")
+
+FIRST_WINDOW_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from PyQt6.QtWidgets import QApplication
+import main_window
+imported = time.perf_counter()
+app = QApplication(sys.argv)
+window = main_window.MainWindow()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "window_ms": (shown - imported) * 1000,
+                  "total_ms": (shown - start) * 1000, "modules": sorted(sys.modules)}))
+"""
+
+def import_times(module="main_window"):
+    """Return [(cumulative µs, self µs, module)] of importing `module` in a fresh interpreter."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=BASE_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"import {module} failed")
+    times = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return times
+
+def first_window():
+    """Time the startup of the main window in a fresh interpreter; return its measurements."""
+    result = subprocess.run([sys.executable, "-c", FIRST_WINDOW_SCRIPT], cwd=BASE_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "the main window failed to start")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Show what ConvoSimul spends its startup time on.")
+    parser.add_argument("--top", type=int, default=25, help="Imports to list (default: 25)")
+    parser.add_argument("--module", default="main_window", help="Module whose imports are timed (default: main_window)")
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    print(f"Slowest imports of {args.module} (cumulative, own time):")
+    for cumulative_us, self_us, name in sorted(times, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms {self_us / 1000:9.1f} ms  {name}")
+
+    window = first_window()
+    print(f"\nTime to first window: {window['total_ms']:.0f} ms ({window['import_ms']:.0f} ms imports, {window['window_ms']:.0f} ms building and showing it)")
+    heavy = sorted({name.split(".")[0] for name in window["modules"] if name.split(".")[0] in HEAVY_MODULES})
+    print(f"Heavy modules loaded before the first window: {', '.join(heavy) if heavy else 'none'}")
+
+if __name__ == "__main__":
+    main()
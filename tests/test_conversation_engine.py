@@ -0,0 +1,53 @@
+import json
+import time
+
+import pytest
+
+import settings
+from conversation_engine import ConversationEngine
+from fake_server import FakeModel, start_in_background
+from presets import new_transcript
+
+class CountingModel(FakeModel):
+    """Counts the reply tokens the server has sent, to see when a stream stops."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sent = 0
+
+    def token_delay(self):
+        self.sent += 1
+        return super().token_delay()
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    model = CountingModel(latency_ms=0, tokens_per_sec=20, seed=1)
+    httpd, base_url = start_in_background(port=0, model=model)
+    config = tmp_path / "setupModels.json"
+    config.write_text(json.dumps({"backend": "openai_compatible", "base_url": base_url, "models": [{"deployment": "fake", "model_name": "fake"}]}))
+    monkeypatch.setattr(settings, "CONFIG_PATH", config)
+    yield model
+    httpd.shutdown()
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_rejected_speculation_closes_its_stream(server, stream):
+    config = (None, 200, "#000000")
+    transcript = new_transcript("You are A.", "You are B.", "A", "B", config, config)
+    engine = ConversationEngine("fake", "fake", transcript, config, config)
+    engine.stream_enabled = stream
+
+    def reject(result, cancel_event=None, index=None):
+        time.sleep(0.3)
+        return False
+    engine.referee_check = reject
+
+    deltas = []
+    in_context, _, next_result = engine.speculate("Hello", on_delta=deltas.append)
+    assert not in_context and next_result is None and not deltas
+    # The server notices the closed connection at its next token and stops sending; the first
+    # request of a test can reach it after the rejection, while the SDK client is being built
+    time.sleep(0.5)
+    sent = server.sent
+    time.sleep(0.5)
+    assert server.sent == sent
+    assert sent < 20
@@ -0,0 +1,37 @@
+from rate_limiter import RateLimiter, TokenBucket
+
+def admitted_times(bucket, amount, seconds):
+    """Times at which requests of `amount` are let through back to back, on a simulated clock."""
+    start, times = bucket.updated, []
+    now = start
+    while True:
+        now += bucket.wait_time(amount, now)
+        if now - start >= seconds:
+            return times
+        bucket.take(amount, now)
+        times.append(now - start)
+
+def test_tokens_per_minute_stay_within_tpm_with_requests_bigger_than_the_bucket():
+    tpm, amount = 10000, 2000
+    times = admitted_times(TokenBucket(tpm), amount, 600)
+    assert len(times) > 10
+    for start in times:
+        in_window = sum(1 for t in times if start <= t < start + 60)
+        assert in_window * amount <= tpm
+
+def test_small_requests_stay_within_tpm():
+    tpm, amount = 6000, 10
+    times = admitted_times(TokenBucket(tpm), amount, 300)
+    for start in times[::50]:
+        assert sum(1 for t in times if start <= t < start + 60) * amount <= tpm
+
+def test_try_acquire_only_takes_what_fits_right_away():
+    limiter = RateLimiter(rpm=600)
+    # The bucket holds one second of requests at 90% of the rate
+    admitted = 0
+    while limiter.try_acquire(1):
+        admitted += 1
+    assert admitted == 9
+    limiter = RateLimiter(tpm=6000)
+    limiter.pause(60)
+    assert not limiter.try_acquire(10)
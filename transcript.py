@@ -0,0 +1,87 @@
+"""
+Single store of a conversation: every message is kept once and the per-model and PDF views
+are built from it when they are needed.
+"""
+
+import string
+import sys
+
+# Saved role of each participant: A and B, then C, D... for conversations with more participants
+SPEAKERS = tuple(string.ascii_uppercase)
+
+class Entry:
+    """One message of the conversation; `speaker` is the participant's index (0 for A, 1 for B...)."""
+    __slots__ = ("speaker", "content")
+
+    def __init__(self, speaker, content):
+        self.speaker = speaker
+        self.content = sys.intern(content)
+
+class Transcript:
+    """
+    System prompts, names and configs of the participants plus the list of exchanged entries.
+
+    `configs` are the (seed, max_tokens, color) tuples shown in the PDF header.
+    """
+
+    def __init__(self, system_prompts, names, configs, entries=None):
+        self.system_prompts = tuple(system_prompts)
+        self.names = tuple(names)
+        self.configs = tuple(configs)
+        self.entries = list(entries) if entries is not None else []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def append(self, speaker, content):
+        self.entries.append(Entry(speaker, content))
+
+    def label(self, speaker):
+        """Name of `speaker`, or its letter when it has none."""
+        return self.names[speaker] or SPEAKERS[speaker]
+
+    def messages_for(self, speaker):
+        """
+        Chat messages as seen by `speaker`: its own entries are "assistant", the others' "user".
+
+        With more than two participants the others' messages start with their name, so the
+        model can tell who said what.
+        """
+        msgs = [{"role": "system", "content": self.system_prompts[speaker]}]
+        named = len(self.names) > 2
+        for entry in self.entries:
+            if entry.speaker == speaker:
+                msgs.append({"role": "assistant", "content": entry.content})
+            elif named:
+                msgs.append({"role": "user", "content": f"{self.label(entry.speaker)}: {entry.content}"})
+            else:
+                msgs.append({"role": "user", "content": entry.content})
+        return msgs
+
+    def pdf_header(self):
+        header = []
+        for speaker in range(len(self.names)):
+            name = self.names[speaker]
+            config = self.configs[speaker]
+            header.append({"role": f"system prompt for {name}:", "content": f"{self.system_prompts[speaker]}\n"})
+            header.append({"role": f"config for {name}:", "content": f"Max tokens: {config[1]}\n Seed: {config[0]}"})
+        return header
+
+    def pdf_messages(self):
+        """The transcript with the system prompts and configs, as expected by export_conversation_to_pdf."""
+        msgs = self.pdf_header()
+        for entry in self.entries:
+            msgs.append({"role": f"{self.names[entry.speaker]}:", "content": entry.content})
+        return msgs
+
+    def to_json(self):
+        """Saved form of the conversation: [{"role": "A"|"B", "content": str}]."""
+        return [{"role": SPEAKERS[entry.speaker], "content": entry.content} for entry in self.entries]
+
+def entries_from_json(data):
+    """Read the entries of a conversation saved with Transcript.to_json."""
+    entries = []
+    for msg in data:
+        if msg["role"] in SPEAKERS:
+            entries.append(Entry(SPEAKERS.index(msg["role"]), msg["content"]))
+    return entries
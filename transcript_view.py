@@ -0,0 +1,224 @@
+"""
+Model/view transcript for the conversation window: one row per message, painted by a delegate
+only while it is visible.
+
+Heights are measured once per message and width, but QListView still walks every row when it
+lays them out, a batch at a time in idle time: that happens once per appended message and,
+while a reply streams, each time it outgrows the half screen reserved for it. Growing or
+finishing a message otherwise only repaints its row.
+"""
+
+from PyQt6.QtWidgets import QListView, QStyledItemDelegate, QStyleOptionViewItem, QStyle, QAbstractItemView, QApplication
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QFontMetrics, QKeySequence
+
+# Space around and between messages, in pixels
+MARGIN = 6
+
+class _Row:
+    """
+    One message; `height` caches the painted height for `width`. A message being streamed is
+    laid out `reserve` pixels high while its text fits.
+    """
+    __slots__ = ("speaker", "text", "width", "height", "reserve")
+
+    def __init__(self, speaker, text):
+        self.speaker = speaker
+        self.text = text
+        self.width = -1
+        self.height = 0
+        self.reserve = 0
+
+class TranscriptModel(QAbstractListModel):
+    """
+    Messages of the conversation window. `speaker` is the participant's index, or None for
+    notices (e.g. errors) shown without a name.
+    """
+
+    # The last message grew, see extend_last
+    last_extended = pyqtSignal()
+    # The streamed last message is complete, see finish_last
+    last_finished = pyqtSignal()
+
+    def __init__(self, names, colors, parent=None):
+        super().__init__(parent)
+        self.names = names
+        self.colors = [QColor(color) for color in colors]
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.row_text(row)
+        if role == Qt.ItemDataRole.ForegroundRole and row.speaker is not None:
+            return self.colors[row.speaker]
+        return None
+
+    def row_text(self, row):
+        if row.speaker is None:
+            return row.text
+        return f"{self.names[row.speaker]}: \n{row.text}"
+
+    def append_message(self, speaker, text):
+        end = len(self.rows)
+        self.beginInsertRows(QModelIndex(), end, end)
+        self.rows.append(_Row(speaker, text))
+        self.endInsertRows()
+
+    def extend(self, messages):
+        """Append (speaker, text) pairs at once, e.g. a loaded conversation."""
+        messages = [_Row(speaker, text) for speaker, text in messages]
+        if not messages:
+            return
+        end = len(self.rows)
+        self.beginInsertRows(QModelIndex(), end, end + len(messages) - 1)
+        self.rows.extend(messages)
+        self.endInsertRows()
+
+    def extend_last(self, text):
+        """Add streamed `text` to the last message, until finish_last()."""
+        row = self.rows[-1]
+        row.text += text
+        row.width = -1
+        # Not dataChanged: QListView lays out every row again on it, at each flush of the
+        # stream. The view repaints the row, or lays it out when it outgrew its reserve
+        self.last_extended.emit()
+
+    def finish_last(self):
+        """The streamed last message is complete: laid out at its own height from the next layout on."""
+        row = self.rows[-1]
+        row.reserve = 0
+        row.width = -1
+        self.last_finished.emit()
+
+    def remove_last(self):
+        end = len(self.rows) - 1
+        self.beginRemoveRows(QModelIndex(), end, end)
+        self.rows.pop()
+        self.endRemoveRows()
+
+class MessageDelegate(QStyledItemDelegate):
+    """Paints a message as its speaker's name in bold over the word-wrapped text, in the speaker's colour."""
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+
+    def text_width(self):
+        return max(50, self.view.viewport().width() - 2 * MARGIN)
+
+    def fonts(self, option):
+        bold = QFont(option.font)
+        bold.setBold(True)
+        return bold, option.font
+
+    def sizeHint(self, option, index):
+        row = index.model().rows[index.row()]
+        self.measure(option, row)
+        return QSize(row.width, max(row.height, row.reserve))
+
+    def measure(self, option, row):
+        width = self.text_width()
+        # Every row is measured again on each layout of the view, measure the text only once per width
+        if row.width != width:
+            bold, font = self.fonts(option)
+            height = 0
+            if row.speaker is not None:
+                height += QFontMetrics(bold).height()
+            if row.text:
+                height += QFontMetrics(font).boundingRect(QRect(0, 0, width, 1 << 24), Qt.TextFlag.TextWordWrap, row.text).height()
+            row.width = width
+            row.height = height + 2 * MARGIN
+
+    def paint(self, painter, option, index):
+        row = index.model().rows[index.row()]
+        painter.save()
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        color = index.data(Qt.ItemDataRole.ForegroundRole) or option.palette.text().color()
+        painter.setPen(color)
+        rect = option.rect.adjusted(MARGIN, MARGIN, -MARGIN, -MARGIN)
+        bold, font = self.fonts(option)
+        if row.speaker is not None:
+            painter.setFont(bold)
+            header = QFontMetrics(bold).height()
+            painter.drawText(QRect(rect.left(), rect.top(), rect.width(), header), Qt.AlignmentFlag.AlignLeft, f"{index.model().names[row.speaker]}:")
+            rect.setTop(rect.top() + header)
+        painter.setFont(font)
+        painter.drawText(rect, Qt.TextFlag.TextWordWrap | Qt.AlignmentFlag.AlignLeft, row.text)
+        painter.restore()
+
+class TranscriptView(QListView):
+    """
+    Read-only list of the messages of a TranscriptModel. Follows new messages while scrolled to
+    the bottom; Ctrl+C copies the selected messages.
+    """
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setItemDelegate(MessageDelegate(self))
+        self.setWordWrap(True)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        # Rows are measured a batch at a time in idle time instead of all at once
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.follow = True
+        self.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+        self.verticalScrollBar().rangeChanged.connect(self.on_range_changed)
+        model.last_extended.connect(self.on_last_extended)
+        model.last_finished.connect(self.on_last_finished)
+
+    def on_scrolled(self, value):
+        self.follow = value >= self.verticalScrollBar().maximum()
+
+    def on_range_changed(self, minimum, maximum):
+        if self.follow:
+            self.verticalScrollBar().setValue(maximum)
+
+    def measure_last(self):
+        option = QStyleOptionViewItem()
+        self.initViewItemOption(option)
+        row = self.model().rows[-1]
+        self.itemDelegate().measure(option, row)
+        return row
+
+    def on_last_extended(self):
+        # A streamed message grew. Resizing a row means laying out all of them, so the message
+        # is given room for half a screen more text and only laid out again when it outgrows it;
+        # until then its row is just repainted
+        row = self.measure_last()
+        if row.height > row.reserve:
+            row.reserve = row.height + self.viewport().height() // 2
+            self.scheduleDelayedItemsLayout()
+        else:
+            self.update(self.model().index(len(self.model().rows) - 1))
+
+    def on_last_finished(self):
+        # The finished message fits the room it was laid out with: it keeps it until the layout
+        # the next message causes anyway, see fit_last for when none follows
+        self.measure_last()
+        self.update(self.model().index(len(self.model().rows) - 1))
+
+    def fit_last(self):
+        """Lay out the finished last message at its own height, e.g. once no other message follows it."""
+        self.scheduleDelayedItemsLayout()
+
+    def scroll_to_end(self):
+        self.follow = True
+        self.scrollToBottom()
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.StandardKey.Copy):
+            rows = sorted(index.row() for index in self.selectedIndexes())
+            model = self.model()
+            QApplication.clipboard().setText("\n\n".join(model.row_text(model.rows[row]) for row in rows))
+            return
+        super().keyPressEvent(event)
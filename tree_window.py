@@ -0,0 +1,214 @@
+import os
+import json
+from pathlib import Path
+from PyQt6.QtWidgets import (
+    QDialog,
+    QDialogButtonBox,
+    QTextEdit,
+    QPushButton,
+    QVBoxLayout,
+    QHBoxLayout,
+    QFormLayout,
+    QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QComboBox,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QSplitter,
+    QLabel,
+    QAbstractItemView,
+)
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor
+from transcript import Transcript
+
+# Longest part of a message shown in the branches tree
+PREVIEW_CHARS = 80
+MAX_BRANCHES = 8
+
+class ForkDialog(QDialog):
+    """Asks where to fork, how many branches and the seed, max tokens and model of each."""
+
+    def __init__(self, lan_pack, messages, deployments, parent=None):
+        super().__init__(parent)
+        self.lan_pack = lan_pack
+        self.deployments = deployments
+        self.setWindowTitle(self.lan_pack.get("fork_window_title"))
+        self.at_turn = QSpinBox()
+        self.at_turn.setRange(0, messages)
+        self.at_turn.setValue(messages)
+        self.branches = QSpinBox()
+        self.branches.setRange(1, MAX_BRANCHES)
+        self.branches.setValue(2)
+        self.turns = QSpinBox()
+        self.turns.setRange(1, 1000)
+        self.turns.setValue(2)
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels([
+            self.lan_pack.get("fork_seed_header"),
+            self.lan_pack.get("fork_max_tokens_header"),
+            self.lan_pack.get("fork_model_header"),
+        ])
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+
+        form = QFormLayout()
+        form.addRow(self.lan_pack.get("fork_at_turn_text"), self.at_turn)
+        form.addRow(self.lan_pack.get("fork_branches_text"), self.branches)
+        form.addRow(self.lan_pack.get("fork_turns_text"), self.turns)
+        layout = QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addWidget(QLabel(self.lan_pack.get("fork_table_description")))
+        layout.addWidget(self.table)
+        layout.addWidget(buttons)
+
+        self.branches.valueChanged.connect(self.set_rows)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        self.set_rows(self.branches.value())
+
+    def set_rows(self, rows):
+        old = self.table.rowCount()
+        self.table.setRowCount(rows)
+        for row in range(old, rows):
+            # Different seeds by default, so the branches actually diverge
+            self.table.setItem(row, 0, QTableWidgetItem(str(row + 1)))
+            self.table.setItem(row, 1, QTableWidgetItem(""))
+            combo = QComboBox()
+            combo.addItem(self.lan_pack.get("fork_same_model"), userData="")
+            for deployment in self.deployments:
+                combo.addItem(deployment, userData=deployment)
+            self.table.setCellWidget(row, 2, combo)
+
+    def branch_settings(self):
+        """Return [{"seed", "max_tokens", "model"}] per branch, None/"" meaning unchanged."""
+        settings = []
+        for row in range(self.table.rowCount()):
+            seed = (self.table.item(row, 0).text() if self.table.item(row, 0) else "").strip()
+            max_tokens = (self.table.item(row, 1).text() if self.table.item(row, 1) else "").strip()
+            settings.append({
+                "seed": int(seed) if seed.isdigit() else None,
+                "max_tokens": int(max_tokens) if max_tokens.isdigit() and int(max_tokens) > 0 else None,
+                "model": self.table.cellWidget(row, 2).currentData(),
+            })
+        return settings
+
+class BranchesDialog(QDialog):
+    """
+    Tree of the conversation's branches: select a message to read the path leading to it
+    (select two to compare them side by side) and export that path to JSON or PDF.
+    """
+
+    def __init__(self, tree, lan_pack, name, parent=None):
+        super().__init__(parent)
+        self.tree = tree
+        self.lan_pack = lan_pack
+        self.name = name
+        self.setWindowTitle(self.lan_pack.get("tree_window_title"))
+        self.resize(1000, 600)
+        self.tree_widget = QTreeWidget()
+        self.tree_widget.setHeaderLabels([self.lan_pack.get("tree_branch_header"), self.lan_pack.get("tree_status_header")])
+        self.tree_widget.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.views = [QTextEdit(), QTextEdit()]
+        for view in self.views:
+            view.setReadOnly(True)
+        self.export_json_btn = QPushButton(self.lan_pack.get("tree_export_json_button_text"))
+        self.export_pdf_btn = QPushButton(self.lan_pack.get("tree_export_pdf_button_text"))
+        self.status_label = QLabel("")
+        self.status_label.setWordWrap(True)
+
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        splitter.addWidget(self.tree_widget)
+        for view in self.views:
+            splitter.addWidget(view)
+        btns = QHBoxLayout()
+        btns.addStretch(1)
+        btns.addWidget(self.export_json_btn)
+        btns.addWidget(self.export_pdf_btn)
+        layout = QVBoxLayout(self)
+        layout.addWidget(splitter)
+        layout.addLayout(btns)
+        layout.addWidget(self.status_label)
+
+        self.tree_widget.itemSelectionChanged.connect(self.on_selection_changed)
+        self.export_json_btn.clicked.connect(self.on_export_json_clicked)
+        self.export_pdf_btn.clicked.connect(self.on_export_pdf_clicked)
+        self.refresh()
+
+    def branch_title(self, branch):
+        if branch.name == "main":
+            return self.lan_pack.get("tree_main_branch")
+        parts = [f"{self.lan_pack.get('tree_branch_label')} {branch.name}", f"{self.lan_pack.get('tree_fork_label')} {branch.fork_depth}"]
+        for key in ("seed", "max_tokens", "model"):
+            if branch.settings.get(key):
+                parts.append(f"{key} {branch.settings[key]}")
+        return ", ".join(parts)
+
+    def refresh(self):
+        # Rebuilt from the tree: branches keep growing while the window is open
+        selected = [(item.data(0, Qt.ItemDataRole.UserRole)) for item in self.tree_widget.selectedItems()]
+        self.tree_widget.clear()
+        for index, branch in enumerate(self.tree.branches):
+            top = QTreeWidgetItem([self.branch_title(branch), self.lan_pack.get(f"tree_status_{branch.status}", branch.status)])
+            top.setData(0, Qt.ItemDataRole.UserRole, (index, len(branch.transcript)))
+            if branch.error:
+                top.setToolTip(1, branch.error)
+            entries = branch.transcript.entries.to_list()
+            for depth in range(branch.fork_depth, len(entries)):
+                entry = entries[depth]
+                preview = entry.content.replace("\n", " ")[:PREVIEW_CHARS]
+                child = QTreeWidgetItem([f"{depth + 1}. {branch.transcript.label(entry.speaker)}: {preview}", ""])
+                child.setForeground(0, QColor(branch.transcript.configs[entry.speaker][2]))
+                child.setData(0, Qt.ItemDataRole.UserRole, (index, depth + 1))
+                top.addChild(child)
+            self.tree_widget.addTopLevelItem(top)
+            if (index, len(branch.transcript)) in selected:
+                top.setSelected(True)
+        self.tree_widget.expandAll()
+
+    def selected_paths(self):
+        """(branch, number of messages) of the selected items, at most two."""
+        paths = []
+        for item in self.tree_widget.selectedItems()[:2]:
+            index, depth = item.data(0, Qt.ItemDataRole.UserRole)
+            paths.append((self.tree.branches[index], depth))
+        return paths
+
+    def path_transcript(self, branch, depth):
+        source = branch.transcript
+        return Transcript(source.system_prompts, source.names, source.configs, source.entries.to_list()[:depth])
+
+    def on_selection_changed(self):
+        paths = self.selected_paths()
+        for i, view in enumerate(self.views):
+            view.clear()
+            if i >= len(paths):
+                continue
+            transcript = self.path_transcript(*paths[i])
+            for entry in transcript.entries:
+                view.setTextColor(QColor(transcript.configs[entry.speaker][2]))
+                view.append(f"{transcript.names[entry.speaker]}: " + "\n" + entry.content + "\n")
+
+    def export_name(self, branch, depth):
+        return f"{self.name}_{branch.name}_{depth}"
+
+    def on_export_json_clicked(self):
+        for branch, depth in self.selected_paths():
+            file_path = Path(__file__).resolve().parent / "outputs" / "Conversations_JSON" / f"{self.export_name(branch, depth)}.json"
+            os.makedirs(file_path.parent, exist_ok=True)
+            try:
+                with open(file_path, "w", encoding="utf-8") as f:
+                    json.dump(self.path_transcript(branch, depth).to_json(), f, ensure_ascii=False, indent=4)
+                self.status_label.setText(f"{self.lan_pack.get('tree_export_done_status')} {file_path}")
+            except Exception as e:
+                print(f"Error saving conversation: {e}")
+                self.status_label.setText(f"{self.lan_pack.get('tree_export_failed_status')} {e}")
+                continue
+            from library import record
+            record(file_path, "conversation", branch.transcript.names, branch.engine.deployments if branch.engine else ())
+
+    def on_export_pdf_clicked(self):
+        # The conversation window renders it in the background and reports when it's written
+        for branch, depth in self.selected_paths():
+            self.parent().export_pdf(self.export_name(branch, depth), self.path_transcript(branch, depth))
+            self.status_label.setText(f"{self.lan_pack.get('tree_export_pdf_started_status')} {self.export_name(branch, depth)}.pdf")
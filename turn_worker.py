@@ -0,0 +1,62 @@
+import threading
+from PyQt6.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+from conversation import TalkCancelled
+
+class TurnWorker(QObject):
+    """
+    Runs batches of turns of a ConversationEngine on its own QThread.
+
+    Every API call happens on the worker thread; results reach the dialog through the
+    signals below, which Qt delivers on the GUI thread.
+    """
+    turn_started = pyqtSignal(int, bool)  # (speaker index, message will be streamed)
+    delta = pyqtSignal(str)  # streamed chunk of the message being generated
+    turn_committed = pyqtSignal(int, str)  # (speaker index, message)
+    tokens_saved = pyqtSignal(int, int)  # (saved by the last turn's history budget, saved in total)
+    out_of_context = pyqtSignal()
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self.cancel_event = threading.Event()
+
+    @pyqtSlot(int)
+    def run(self, turns):
+        self.cancel_event.clear()
+        try:
+            in_context = self.engine.play(
+                turns,
+                self.cancel_event,
+                on_turn_started=self.turn_started.emit,
+                on_delta=self.delta.emit,
+                on_commit=self.on_commit,
+            )
+            if not in_context:
+                self.out_of_context.emit()
+        except TalkCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.finished.emit()
+
+    def on_commit(self, speaker, result):
+        # Runs on the worker thread right after the engine committed the turn
+        self.turn_committed.emit(speaker, result)
+        saved = self.engine.tokens_saved[-1]
+        if saved:
+            self.tokens_saved.emit(saved, sum(self.engine.tokens_saved))
+
+    def cancel(self):
+        # Safe to call from the GUI thread: the in-flight talk() polls this event
+        self.cancel_event.set()
+
+def start_worker_thread(worker):
+    """Move `worker` onto a new running QThread and return the thread."""
+    thread = QThread()
+    worker.moveToThread(thread)
+    thread.start()
+    return thread